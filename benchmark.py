@@ -0,0 +1,207 @@
+"""
+真！こうかとん無双のフレーム時間ベンチマーク
+決められたシナリオでGameを動かし，update／collide／drawの各フェーズの
+p50／p95／p99フレーム時間（ミリ秒）をJSONに書き出す
+
+使い方：
+    python benchmark.py --out bench.json
+    python benchmark.py --out new.json --compare bench.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import pygame as pg
+
+import musou_kokaton as mk
+
+
+SCENARIOS = {  # シナリオ名: 設定
+    "stage1_score_lt50": {"stage": 1, "score": 0},
+    "stage1_score_50_100": {"stage": 1, "score": 75},
+    "stage1_score_gt100": {"stage": 1, "score": 150},
+    "stage2_boss": {"stage": 2, "score": 0},
+    "emp_active": {"stage": 1, "score": 150, "emp": True},
+    "stress_100_bombs": {"stage": 1, "score": 0, "bombs": 100},
+    "stress_500_bombs": {"stage": 1, "score": 0, "bombs": 500},
+    "stress_500_bombs_rect": {"stage": 1, "score": 0, "bombs": 500, "collision": "rect"},
+    "stress_1000_bombs": {"stage": 1, "score": 0, "bombs": 1000},
+    "stress_200_enemies": {"stage": 1, "score": 0, "enemies": 200},
+    "shield_500_bombs": {"stage": 1, "score": 0, "bombs": 500, "shield": True},
+    "shield_500_bombs_rect": {"stage": 1, "score": 0, "bombs": 500, "shield": True, "collision": "rect"},
+    "neobeam_volleys": {"stage": 1, "score": 150, "neobeam": True, "enemies": 5},  # 10フレームごとに右クリックでNeoBeamを撃つ
+    "gravity_500_bombs": {"stage": 1, "score": 150, "bombs": 500, "burst": 50, "gravity": True, "enemies": 5},  # 50フレームごとに500発が一斉に爆発する
+}
+PHASES = ("update", "collide", "draw", "total")
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    valuesのq（0～100）パーセンタイルを返す（最近傍法）
+    """
+    data = sorted(values)
+    i = min(len(data) - 1, max(0, round(q / 100 * len(data)) - 1))
+    return data[i]
+
+
+def aim_policy(game: mk.Game, neobeam: bool = False) -> mk.InputFrame:
+    """
+    10フレームごとに敵機（いなければボス）を狙ってビームを撃つスクリプト入力
+    neobeamがTrueなら，スコアが100以上のときは右クリックでNeoBeamを撃つ
+    """
+    targets = game.emys.sprites() or game.bosses.sprites()
+    if not targets or game.frames % 10:
+        return mk.InputFrame()
+    target = targets[game.frames // 10 % len(targets)]
+    if neobeam and game.score.value >= 100:
+        return mk.InputFrame(buttons=(False, False, True), mouse_pos=target.rect.center)
+    return mk.InputFrame(buttons=(True, False, False), mouse_pos=target.rect.center)
+
+
+def setup(game: mk.Game, conf: dict):
+    """
+    シナリオの初期状態を作る
+    こうかとんは無敵状態にし，ゲームオーバーで計測が途切れないようにする
+    """
+    game.stage_manager.stage = conf["stage"]
+    game.score.value = conf["score"]
+    game.bird.state = "hyper"
+    for _ in range(conf.get("enemies", 5)):
+        emy = mk.Enemy()
+        emy.rect.centery = emy.bound + 1  # すぐに停止状態にする
+        game.add_enemy(emy)
+    if conf.get("emp"):
+        game.emp.activate()
+    if conf.get("gravity"):
+        gra = mk.Gravity()
+        gra.schedule(game.sched)
+        game.gra.add(gra)
+
+
+def pin(game: mk.Game, conf: dict):
+    """
+    シナリオの条件（ステージ，スコア，爆弾数，防御壁，NeoBeamの残り回数）を毎フレーム保つ
+    （burstがあれば爆弾はburstフレームごとに補充する）
+    """
+    game.score.value = conf["score"]
+    if conf.get("shield") and not game.shield:  # 防御壁を出し続ける（爆弾に当たって消えたら出し直す）
+        shield = mk.Shield(game.bird, life=400)
+        shield.schedule(game.sched)
+        game.shield.add(shield)
+    if conf.get("neobeam"):  # NeoBeamを撃ち続けられるようにする
+        game.stage_manager.reset_neobeam_uses()
+    game.stage_manager.enemy_kill_count = 0  # ステージ1をクリアさせない
+    for boss in game.bosses:
+        boss.health = game.difficulty.boss_health  # ボスを倒させない
+    n = conf.get("bombs", 0) if game.frames % conf.get("burst", 1) == 0 else 0
+    while len(game.emys) < conf.get("enemies", 0):  # 撃墜された敵機を補充する（上から降下してくる）
+        game.add_enemy()
+    emys = game.emys.sprites()
+    while len(game.bombs) < n and emys:
+        game.bombs.add(mk.Bomb.acquire(emys[len(game.bombs) % len(emys)], game.bird, 6))
+
+
+def run_frame(game: mk.Game, frame: mk.InputFrame, screen: pg.Surface, conf: dict) -> dict[str, float]:
+    """
+    Game.step()で1フレームを実行して描画し，フェーズごとの時間（ミリ秒）を返す
+    （フェーズの区切りはGame.step()のlapで受け取るので，実際のゲームループと同じ順になる）
+    """
+    laps = {}
+    t0 = time.perf_counter()
+    pin(game, conf)
+    game.step(frame, lap=lambda phase: laps.__setitem__(phase, time.perf_counter()))
+    t1, t2 = laps["spawn"], laps["collide"]
+    t3 = laps.get("update", t2)  # 衝突でステージが終わったフレームはupdateがない
+    game.draw(screen)
+    t4 = time.perf_counter()
+    return {
+        "update": (t1 - t0 + t3 - t2) * 1000,
+        "collide": (t2 - t1) * 1000,
+        "draw": (t4 - t3) * 1000,
+        "total": (t4 - t0) * 1000,
+    }
+
+
+def run_scenario(name: str, screen: pg.Surface, frames: int, warmup: int, seed: int) -> dict:
+    """
+    シナリオを1つ実行し，フェーズごとの統計を返す
+    """
+    conf = SCENARIOS[name]
+    game = mk.Game(seed=seed, collision=conf.get("collision", "mask"))
+    setup(game, conf)
+    samples = {phase: [] for phase in PHASES}
+    bombs = 0
+    for i in range(warmup + frames):
+        timing = run_frame(game, aim_policy(game, conf.get("neobeam", False)), screen, conf)
+        if i < warmup:
+            continue
+        bombs += len(game.bombs)
+        for phase in PHASES:
+            samples[phase].append(timing[phase])
+    result = {"frames": frames, "avg_bombs": bombs / frames}
+    for phase in PHASES:
+        result[phase] = {f"p{q}": round(percentile(samples[phase], q), 4) for q in (50, 95, 99)}
+    return result
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(base: dict, new: dict):
+    """
+    2つの結果のp50／p95（total）を並べて表示する
+    """
+    print(f"{'scenario':24} {'p50 base':>9} {'p50 new':>9} {'p95 base':>9} {'p95 new':>9}")
+    for name, res in new["scenarios"].items():
+        old = base["scenarios"].get(name)
+        if old is None:
+            continue
+        print(f"{name:24} {old['total']['p50']:9.3f} {res['total']['p50']:9.3f} "
+              f"{old['total']['p95']:9.3f} {res['total']['p95']:9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="フレーム時間ベンチマーク")
+    parser.add_argument("--frames", type=int, default=300, help="計測するフレーム数")
+    parser.add_argument("--warmup", type=int, default=50, help="計測前に捨てるフレーム数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="実行するシナリオ（複数指定可，省略時はすべて）")
+    parser.add_argument("--out", help="結果を書き出すJSONファイル")
+    parser.add_argument("--compare", help="比較する過去の結果JSONファイル")
+    args = parser.parse_args()
+
+    mk.init_headless()
+    screen = pg.display.set_mode((mk.WIDTH, mk.HEIGHT))
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "pygame": pg.version.ver,
+        "numpy": mk.np.__version__ if mk.np is not None else None,
+        "scenarios": {},
+    }
+    for name in args.scenario or SCENARIOS:
+        res = run_scenario(name, screen, args.frames, args.warmup, args.seed)
+        report["scenarios"][name] = res
+        print(f"{name:24} total p50={res['total']['p50']:.3f}ms p95={res['total']['p95']:.3f}ms "
+              f"p99={res['total']['p99']:.3f}ms bombs={res['avg_bombs']:.0f}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+    pg.quit()
+
+
+if __name__ == "__main__":
+    main()
+    sys.exit()
@@ -1,14 +1,36 @@
+import argparse
+import heapq
+import json
 import math
+import mmap
 import os
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 import random
+import shutil
+import struct
+import subprocess
 import sys
 import time
+import warnings
+import weakref
 import pygame as pg
+try:
+    import numpy as np
+except ImportError:  # numpyが無い環境ではスプライトごとに更新する
+    np = None
 
 
 WIDTH = 1100  # ゲームウィンドウの幅
 HEIGHT = 650  # ゲームウィンドウの高さ
 reference = 200  # 場面変化の基準スコア
+SIM_HZ = 50  # 1秒あたりのシミュレーション回数（速度やタイマーはこの1回を単位とする）
+MAX_CATCH_UP = 5  # 1回の描画で追いつくために進めるシミュレーション回数の上限
+JP_FONT = "jp"  # 日本語フォントの名前（実際のファイルはFONTSが探す）
+BUNDLE_FILES = ([f"fig/{i}.png" for i in range(10)] + [f"fig/alien{i}.png" for i in range(1, 4)] +
+                ["fig/beam.png", "fig/bomb.png", "fig/boom.png", "fig/boss.png", "fig/explosion.gif", "fig/pg_bg.jpg"])  # 起動時に読み込む画像
+BUNDLE_PATH = "fig/assets.bundle"  # デコード済みの画像をまとめたファイル（無いか古ければ起動時に作る）
+START_TIME = time.perf_counter()  # 起動時間の計測用
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 
@@ -38,46 +60,1409 @@ def calc_orientation(org: pg.Rect, dst: pg.Rect) -> tuple[float, float]:
     return x_diff/norm, y_diff/norm
 
 
-def show_instructions(screen):
-    font = pg.font.Font("C:/Windows/Fonts/msgothic.ttc", 50) # 日本語フォントを指定
-    instructions = [
-        "操作説明:",
-    "WASDキー: こうかとんを移動",
-    "左Shiftキー: 高速化",
-    "左クリック: ビーム発射",
-    "右クリック: 弾幕",
-    "リターンキー: 重力場 (100スコア消費)",
-    "RShift: 無敵モード (50スコア消費)",
-    "[l]キー: 防御壁 (50スコア消費)",
-    "[e]キー: 敵機と爆弾の無効化 (20スコア消費)",
-    ]
+class AssetManager:
+    """
+    画像ファイルを一度だけ読み込み，共有Surfaceとして使い回すクラス
+    読み込み（miss）と再利用（hit）の回数を記録する
+    """
+    def __init__(self):
+        self.cache: dict[str, pg.Surface] = {}
+        self.raw: set[str] = set()  # 画面生成前に読み込み，まだ変換していない画像
+        self.hits = 0
+        self.misses = 0
+        self.bundle = None  # 読み込んだAssetBundle
+
+    @staticmethod
+    def _convert(img: pg.Surface) -> pg.Surface:
+        """
+        画面のピクセル形式に変換する（透過のある画像はconvert_alpha，それ以外はconvert）
+        カラーキーの画像もconvert_alphaにしないと，回転したときに角が黒くなる
+        """
+        if img.get_flags() & pg.SRCALPHA or img.get_colorkey() is not None:
+            return img.convert_alpha()
+        return img.convert()
 
-    screen.fill((0, 0, 0)) # 背景を黒に塗りつぶす
-    for i, line in enumerate(instructions):
-        text = font.render(line, True, (255, 255, 255)) # 白色でテキストを描画
-        screen.blit(text, (50, 50 + i * 60)) # テキストを表示
-
-    # 「Sを押して戻る」のメッセージ
-    back_message = "Bキーを押して戻る"
-    back_text = font.render(back_message, True, (255, 0, 0))  # 赤色で描画
-    screen.blit(back_text, (50, 50 + len(instructions) * 60))  # 操作説明の下に表示
-
-    pg.display.update()  # 画面更新
-    while True:
-        for event in pg.event.get():
-            if event.type == pg.KEYDOWN and event.key == pg.K_b:
-                return  # Sキーで操作説明を終了し、ゲーム開始画面に戻る
-
-def check_game_clear(score: "Score", screen):
-    if score.value > 1100:
-        font = pg.font.Font(None, 80)
-        text = font.render("ゲームクリア！", True, (255, 255, 0))
-        rect = text.get_rect(center=(WIDTH//2, HEIGHT//2))
-        screen.blit(text, rect)
-        pg.display.update()
-        time.sleep(3)
+    def load(self, path: str) -> pg.Surface:
+        """
+        画像Surfaceを返す．2回目以降はキャッシュ済みのSurfaceを返す
+        引数 path：画像ファイルのパス
+        戻り値：共有Surface（呼び出し側で直接書き換えないこと）
+        """
+        img = self.cache.get(path)
+        if img is None:
+            self.misses += 1
+            img = pg.image.load(path)
+            self.raw.add(path)
+        else:
+            self.hits += 1
+        if path in self.raw and pg.display.get_surface() is not None:
+            img = __class__._convert(img)
+            self.raw.discard(path)
+        self.cache[path] = img
+        return img
+
+    def scaled(self, path: str, size: tuple[int, int]) -> pg.Surface:
+        """
+        指定サイズに拡大縮小した画像Surfaceを返す（サイズごとに一度だけ生成）
+        引数1 path：画像ファイルのパス
+        引数2 size：(幅, 高さ)
+        """
+        key = f"{path}@{size[0]}x{size[1]}"
+        img = self.cache.get(key)
+        if img is None:
+            img = pg.transform.scale(self.load(path), size)
+            self.cache[key] = img
+        else:
+            self.hits += 1
+        return img
+
+    def flipped(self, path: str, flip_x: bool, flip_y: bool) -> pg.Surface:
+        """
+        反転した画像Surfaceを返す（向きごとに一度だけ生成）
+        引数1 path：画像ファイルのパス
+        引数2 flip_x：左右反転するか
+        引数3 flip_y：上下反転するか
+        """
+        key = f"{path}@flip{int(flip_x)}{int(flip_y)}"
+        img = self.cache.get(key)
+        if img is None:
+            img = pg.transform.flip(self.load(path), flip_x, flip_y)
+            self.cache[key] = img
+        else:
+            self.hits += 1
+        return img
+
+    def stats(self) -> dict[str, int]:
+        """
+        キャッシュの利用状況を辞書で返す
+        """
+        return {"hits": self.hits, "misses": self.misses, "files": len(self.cache)}
+
+
+ASSETS = AssetManager()  # ゲーム全体で共有する画像キャッシュ
+
+
+class AssetBundle:
+    """
+    デコード済みの画像（生のピクセル列）を1つのファイルにまとめたもの
+    mmapで開き，pg.image.frombufferでピクセル列をそのままSurfaceにするので，PNGやJPEGのデコードが要らない
+    形式：MAGIC，目次の長さ(uint32)，目次（JSON），ピクセル列
+        目次：{パス: [オフセット, 幅, 高さ, "RGB"か"RGBA", カラーキーかnull, 元ファイルの大きさ, 更新時刻(ns)]}
+    """
+    MAGIC = b"KKAB\x01"
+    HEADER = struct.Struct("<I")
+
+    def __init__(self, path: str):
+        """
+        引数 path：バンドルファイルのパス
+        """
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)  # 書き込まれてもファイルは変えない
+        magic = self.map[:len(__class__.MAGIC)]
+        if magic != __class__.MAGIC:
+            raise ValueError(f"{path}はアセットバンドルではありません")
+        pos = len(magic)
+        size, = __class__.HEADER.unpack_from(self.map, pos)
+        pos += __class__.HEADER.size
+        self.toc: dict[str, list] = json.loads(self.map[pos:pos + size])
+
+    @staticmethod
+    def source_stamp(path: str) -> list[int]:
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+
+    def fresh(self, files: list[str]) -> bool:
+        """
+        filesがすべて入っていて，元ファイルから変わっていないか
+        """
+        try:
+            return all(f in self.toc and self.toc[f][5:] == __class__.source_stamp(f) for f in files)
+        except OSError:
+            return False
+
+    def surface(self, name: str) -> pg.Surface:
+        """
+        画像nameのSurfaceを返す（ピクセル列はmmapと共有）
+        """
+        offset, width, height, fmt, colorkey = self.toc[name][:5]
+        size = width * height * len(fmt)
+        img = pg.image.frombuffer(memoryview(self.map)[offset:offset + size], (width, height), fmt)
+        if colorkey is not None:
+            img.set_colorkey(colorkey)
+        return img
+
+    @staticmethod
+    def build(path: str, files: list[str]):
+        """
+        filesをデコードしてバンドルファイルを作る
+        """
+        toc, blobs, offset = {}, [], 0
+        for f in files:
+            img = pg.image.load(f)
+            fmt = "RGBA" if img.get_flags() & pg.SRCALPHA else "RGB"
+            colorkey = img.get_colorkey()
+            data = pg.image.tobytes(img, fmt)
+            toc[f] = [offset, img.get_width(), img.get_height(), fmt,
+                      None if colorkey is None else list(colorkey[:3])] + AssetBundle.source_stamp(f)
+            blobs.append(data)
+            offset += len(data)
+        # 目次の後ろから始まるようにオフセットをずらす（目次の長さが変わらなくなるまで）
+        shift = 0
+        while True:
+            head = json.dumps({f: [e[0] + shift] + e[1:] for f, e in toc.items()}, ensure_ascii=False).encode()
+            new_shift = len(AssetBundle.MAGIC) + AssetBundle.HEADER.size + len(head)
+            if new_shift == shift:
+                break
+            shift = new_shift
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as out:
+            out.write(AssetBundle.MAGIC + AssetBundle.HEADER.pack(len(head)) + head)
+            for data in blobs:
+                out.write(data)
+        os.replace(tmp, path)  # 書き込み途中のファイルを読まないように置き換える
+
+
+def preload_assets(files: list[str] = BUNDLE_FILES, bundle: str = BUNDLE_PATH, progress=None) -> dict:
+    """
+    起動時に画像をまとめてASSETSに読み込む
+    バンドルが無いか古ければ，画像をデコードしてバンドルを作り直す（cold）．あればmmapで読むだけ（warm）
+    引数1 files：読み込む画像のパス
+    引数2 bundle：バンドルファイルのパス
+    引数3 progress：1枚読み込むごとに(読み込んだ数, 全体の数)で呼ぶ関数
+    戻り値：{"mode": "cold"か"warm"か"files", "ms": 読み込み時間, "files": 画像数}
+    """
+    start = time.perf_counter()
+    mode = "warm"
+    try:
+        pack = AssetBundle(bundle)
+        if not pack.fresh(files):
+            raise ValueError("stale")
+    except (OSError, ValueError):
+        mode = "cold"
+        try:
+            AssetBundle.build(bundle, files)
+            pack = AssetBundle(bundle)
+        except OSError:  # 書き込めない場所では画像ファイルを直接読む
+            mode, pack = "files", None
+    for i, f in enumerate(files, 1):
+        if pack is None:
+            ASSETS.load(f)
+        else:
+            ASSETS.cache[f] = pack.surface(f)
+            ASSETS.raw.add(f)
+            ASSETS.load(f)  # 画面があれば画面のピクセル形式に変換する
+        if progress is not None:
+            progress(i, len(files))
+    ASSETS.bundle = pack  # 変換していないSurfaceが使うmmapを閉じないように持っておく
+    return {"mode": mode, "ms": (time.perf_counter() - start) * 1000, "files": len(files)}
+
+
+class RotationAtlas:
+    """
+    回転・縮小済みの画像を，量子化した角度と大きさごとに保存するクラス
+    必要になった組み合わせだけを生成し，上限を超えたら古いものから捨てる（LRU）
+    """
+    def __init__(self, angle_step: float = 1, size_step: int = 1, max_items: int = 2048):
+        """
+        引数1 angle_step：角度の量子化幅（度）
+        引数2 size_step：大きさの量子化幅（px）
+        引数3 max_items：保存する画像の上限数
+        """
+        self.angle_step = angle_step
+        self.size_step = size_step
+        self.max_items = max_items
+        self.items: OrderedDict[tuple, pg.Surface] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def quantize_angle(self, angle: float) -> float:
+        return round(angle / self.angle_step) * self.angle_step % 360
+
+    def quantize_size(self, size: int | None) -> int | None:
+        if size is None:
+            return None
+        return max(self.size_step, round(size / self.size_step) * self.size_step)
+
+    def get(self, path: str, angle: float, size: int | None = None) -> pg.Surface:
+        """
+        回転済みの画像Surfaceを返す
+        引数1 path：元画像のパス
+        引数2 angle：回転角度（度）
+        引数3 size：短辺の長さ（縦横比は保つ）．Noneなら元の大きさ
+        戻り値：共有Surface（呼び出し側で直接書き換えないこと）
+        """
+        key = (path, self.quantize_angle(angle), self.quantize_size(size))
+        img = self.items.get(key)
+        if img is not None:
+            self.hits += 1
+            self.items.move_to_end(key)
+            return img
+        self.misses += 1
+        img = ASSETS.load(path)
+        if key[2] is not None:
+            img_width, img_height = img.get_size()  # 元の画像の縦横比を取得
+            if img_width > img_height:  # 高さを基準にリサイズ
+                height = key[2]
+                width = int((img_width / img_height) * height)
+            else:  # 幅を基準にリサイズ
+                width = key[2]
+                height = int((img_height / img_width) * width)
+            img = pg.transform.scale(img, (width, height))
+        img = pg.transform.rotozoom(img, key[1], 1.0)
+        self.items[key] = img
+        if len(self.items) > self.max_items:
+            self.items.popitem(last=False)  # 一番使われていない画像を捨てる
+        return img
+
+    def stats(self) -> dict[str, int]:
+        """
+        アトラスの利用状況を辞書で返す
+        """
+        return {"hits": self.hits, "misses": self.misses, "items": len(self.items)}
+
+
+ATLAS = RotationAtlas(angle_step=1, size_step=2)  # 爆弾・ビームの回転画像を共有するアトラス
+
+
+class PoseCache:
+    """
+    こうかとんの姿勢ごとの画像を保存するクラス
+    姿勢はキーのタプルで表す
+        ("face", num)：表情を変えたこうかとん（fig/{num}.png）
+        ("move", num, dire)：移動方向direを向いたこうかとん
+        ("aim", angle)：照準の方向（量子化した角度）を向いたこうかとん
+    無敵状態の画像（ラプラシアンフィルタ）も姿勢ごとに1回だけ作る
+    """
+    def __init__(self, angle_step: float = 1, zoom: float = 0.9):
+        """
+        引数1 angle_step：照準角度の量子化幅（度）
+        引数2 zoom：こうかとん画像の拡大率
+        """
+        self.angle_step = angle_step
+        self.zoom = zoom
+        self.items: dict[tuple, pg.Surface] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def aim_key(self, angle: float) -> tuple:
+        return ("aim", round(angle / self.angle_step) * self.angle_step)
+
+    def get(self, key: tuple, hyper: bool = False) -> pg.Surface:
+        """
+        姿勢keyの画像を返す（無ければ作って保存する）
+        引数1 key：姿勢のタプル
+        引数2 hyper：無敵状態の画像にするか
+        戻り値：共有Surface（呼び出し側で直接書き換えないこと）
+        """
+        img = self.items.get((key, hyper))
+        if img is not None:
+            self.hits += 1
+            return img
+        self.misses += 1
+        if hyper:
+            img = pg.transform.laplacian(self.get(key))  # 無敵時の画像変換
+        else:
+            img = getattr(self, f"_{key[0]}")(*key[1:])
+        self.items[(key, hyper)] = img
+        return img
+
+    def preload(self, num: int, faces: tuple[int, ...] = (3, 6, 9)):
+        """
+        移動方向と表情の画像（通常・無敵）を前もって作る
+        """
+        keys = [("move", num, dire) for dire in Bird.delta_dires] + [("face", n) for n in faces]
+        for key in keys:
+            self.get(key)
+            self.get(key, True)
+
+    def _face(self, num: int) -> pg.Surface:
+        return pg.transform.rotozoom(ASSETS.load(f"fig/{num}.png"), 0, self.zoom)
+
+    def _move(self, num: int, dire: tuple[int, int]) -> pg.Surface:
+        img0 = self.get(("face", num))
+        img = pg.transform.flip(img0, True, False)  # デフォルトのこうかとん
+        angles = {  # 移動方向: (元にする画像, 回転角度)
+            (+1, 0): (img, None),  # 右
+            (+1, -1): (img, 45),  # 右上
+            (0, -1): (img, 90),  # 上
+            (-1, -1): (img0, -45),  # 左上
+            (-1, 0): (img0, None),  # 左
+            (-1, +1): (img0, 45),  # 左下
+            (0, +1): (img, -90),  # 下
+            (+1, +1): (img, -45),  # 右下
+        }
+        base, angle = angles[dire]
+        return base if angle is None else pg.transform.rotozoom(base, angle, self.zoom)
+
+    def _aim(self, angle: float) -> pg.Surface:
+        img = pg.transform.flip(ASSETS.load("fig/3.png"), True, angle > 90)  # 左半分は上下も反転
+        return pg.transform.rotozoom(img, angle, 1.1)
+
+    def stats(self) -> dict[str, int]:
+        """
+        キャッシュの利用状況を辞書で返す
+        """
+        return {"hits": self.hits, "misses": self.misses, "items": len(self.items)}
+
+
+POSES = PoseCache()  # こうかとんの姿勢ごとの画像
+
+
+class FontRegistry:
+    """
+    日本語を表示できるフォントを一度だけ探し，Fontオブジェクトを(フォント, サイズ)ごとに使い回すクラス
+    探す順番：
+        1. 指定したパス（--font，または環境変数KOKATON_FONT）
+        2. よくある場所にある日本語フォント（Windows／macOS／Linux）
+        3. fontconfigで日本語に対応したフォント（pg.font.match_font，fc-list :lang=ja）
+        4. fonts/以下に置いたフォント（.ttf／.otf／.ttc．リポジトリにはフォントを同梱していない）
+        5. pygame標準フォント（日本語は表示できないが，落ちずに起動できる）
+    見つけたフォントが日本語を表示できなければ警告を出す
+    """
+    CANDIDATES = (
+        "C:/Windows/Fonts/msgothic.ttc",
+        "C:/Windows/Fonts/meiryo.ttc",
+        "C:/Windows/Fonts/YuGothM.ttc",
+        "/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc",
+        "/System/Library/Fonts/Hiragino Sans GB.ttc",
+        "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+        "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+        "/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc",
+        "/usr/share/fonts/truetype/fonts-japanese-gothic.ttf",
+        "/usr/share/fonts/opentype/ipafont-gothic/ipag.ttf",
+        "/usr/share/fonts/truetype/takao-gothic/TakaoGothic.ttf",
+    )
+    SYSFONTS = ("notosanscjkjp", "notosanscjk", "notosansjp", "ipagothic", "ipaexgothic", "takaogothic",
+                "msgothic", "meiryo", "yugothic", "hiraginosans", "hiraginokakugothicpro")
+    BUNDLED = "fonts"  # 手元で用意したフォントを置くディレクトリ
+    SAMPLE = "あア日"  # 日本語を表示できるか確かめる文字
+
+    def __init__(self, path: str | None = None):
+        """
+        引数 path：使うフォントファイルのパス（Noneなら探す）
+        """
+        self.path = path  # 指定されたパス
+        self.resolved: str | None = None  # 見つけたフォントファイル（Noneならpygame標準フォント）
+        self.searched = False
+        self.fonts: dict[tuple[str | None, int], pg.font.Font] = {}
+
+    def configure(self, path: str | None):
+        """
+        使うフォントファイルを指定し直す
+        """
+        self.path = path
+        self.searched = False
+        self.fonts.clear()
+
+    def _fontconfig(self) -> str | None:
+        with warnings.catch_warnings():  # fc-listが無い環境の警告は出さない
+            warnings.simplefilter("ignore")
+            found = pg.font.match_font(__class__.SYSFONTS)
+        if found:
+            return found
+        if shutil.which("fc-list") is None:
+            return None
+        try:
+            out = subprocess.run(["fc-list", ":lang=ja", "file"], capture_output=True, text=True, timeout=5).stdout
+        except (OSError, subprocess.SubprocessError):
+            return None
+        files = sorted(line.strip().rstrip(":") for line in out.splitlines() if line.strip())
+        return files[0] if files else None
+
+    def _bundled(self) -> str | None:
+        if not os.path.isdir(__class__.BUNDLED):
+            return None
+        for name in sorted(os.listdir(__class__.BUNDLED)):
+            if name.lower().endswith((".ttf", ".otf", ".ttc")):
+                return os.path.join(__class__.BUNDLED, name)
+        return None
+
+    @staticmethod
+    def covers_japanese(path: str | None) -> bool:
+        """
+        フォントが日本語の文字を持っているかを返す
+        （持っていない文字は「□」（.notdef）になるので，必ず存在しない文字U+FFFFと同じ画像になるかで判定する）
+        """
+        try:
+            font = pg.font.Font(path, 24)
+        except (OSError, pg.error):
+            return False
+        missing = pg.image.tobytes(font.render("\uffff", False, (255, 255, 255)), "RGB")
+        return all(pg.image.tobytes(font.render(ch, False, (255, 255, 255)), "RGB") != missing
+                   for ch in __class__.SAMPLE)
+
+    def resolve(self) -> str | None:
+        """
+        日本語フォントのファイルを返す（最初の1回だけ探す）
+        """
+        if self.searched:
+            return self.resolved
+        self.searched = True
+        self.resolved = self._search()
+        if self.resolved is None:
+            print("警告：日本語フォントが見つかりません．タイトルやHUDの日本語は□で表示されます"
+                  "（--fontか環境変数KOKATON_FONTで指定するか，fonts/に日本語フォントを置いてください）")
+        elif not __class__.covers_japanese(self.resolved):
+            print(f"警告：フォント{self.resolved}は日本語を表示できないので，日本語は□で表示されます"
+                  "（--fontか環境変数KOKATON_FONTで日本語フォントを指定してください）")
+        return self.resolved
+
+    def _search(self) -> str | None:
+        for path in (self.path, os.environ.get("KOKATON_FONT")):
+            if path:
+                if os.path.isfile(path):
+                    return path
+                print(f"フォント{path}が見つからないので，ほかの日本語フォントを探します")
+        for path in __class__.CANDIDATES:
+            if os.path.isfile(path):
+                return path
+        return self._fontconfig() or self._bundled()
+
+    def font(self, name: str | None, size: int) -> pg.font.Font:
+        """
+        Fontオブジェクトを返す（フォントファイルは(フォント, サイズ)ごとに一度だけ開く）
+        引数1 name：JP_FONTなら日本語フォント，それ以外はフォントファイルのパス（Noneならpygame標準フォント）
+        引数2 size：文字の大きさ
+        """
+        key = (name, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pg.font.Font(self.resolve() if name == JP_FONT else name, size)
+            self.fonts[key] = font
+        return font
+
+    def get(self, size: int) -> pg.font.Font:
+        """
+        日本語フォントのFontオブジェクトを返す
+        """
+        return self.font(JP_FONT, size)
+
+
+FONTS = FontRegistry()  # ゲーム全体で共有するフォント
+
+
+class TextCache:
+    """
+    HUD用の文字列画像を(フォント, サイズ, 文字列, 色)ごとに保存するクラス
+    Fontオブジェクトも使い回し，内容が変わった文字列だけを描画し直す
+    """
+    def __init__(self, max_items: int = 256):
+        self.items: OrderedDict[tuple, pg.Surface] = OrderedDict()
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, name: str | None, size: int) -> pg.font.Font:
+        """
+        Fontオブジェクトを返す（FONTSで共有する）
+        引数1 name：JP_FONTかフォントファイルのパス（Noneならpygame標準フォント）
+        引数2 size：文字の大きさ
+        """
+        return FONTS.font(name, size)
+
+    def render(self, text: str, size: int, color: tuple[int, int, int],
+               name: str | None = JP_FONT, antialias: bool = True) -> pg.Surface:
+        """
+        文字列を描画したSurfaceを返す
+        引数1 text：表示する文字列
+        引数2 size：文字の大きさ
+        引数3 color：文字色
+        引数4 name：JP_FONTかフォントファイルのパス（Noneならpygame標準フォント）
+        引数5 antialias：アンチエイリアスの有無
+        戻り値：共有Surface（呼び出し側で直接書き換えないこと）
+        """
+        key = (name, size, text, color, antialias)
+        img = self.items.get(key)
+        if img is not None:
+            self.hits += 1
+            self.items.move_to_end(key)
+            return img
+        self.misses += 1
+        img = self.font(name, size).render(text, antialias, color)
+        self.items[key] = img
+        if len(self.items) > self.max_items:
+            self.items.popitem(last=False)
+        return img
+
+
+TEXT = TextCache()  # HUDの文字列キャッシュ
+
+
+class OverlayCache:
+    """
+    全画面に重ねる半透明の単色Surfaceを(色, 透明度, 大きさ)ごとに1枚だけ作って共有するクラス
+    precomposed=Trueでは，アルファ合成と同じ結果になる乗算・加算用の不透明Surfaceを使う
+    """
+    def __init__(self):
+        self.items: dict[tuple, pg.Surface] = {}
+
+    def _make(self, key: tuple, fill: tuple, flags: int = 0) -> pg.Surface:
+        img = self.items.get(key)
+        if img is None:
+            img = pg.Surface(key[-1], flags)
+            img.fill(fill)
+            if pg.display.get_surface() is not None:
+                img = img.convert_alpha() if flags & pg.SRCALPHA else img.convert()
+            self.items[key] = img
+        return img
+
+    def get(self, color: tuple[int, int, int], alpha: int,
+            size: tuple[int, int] = (WIDTH, HEIGHT)) -> pg.Surface:
+        """
+        ピクセルごとの透明度をもつ単色Surfaceを返す
+        引数1 color：色
+        引数2 alpha：透明度（0～255）
+        引数3 size：大きさ
+        戻り値：共有Surface（呼び出し側で直接書き換えないこと）
+        """
+        return self._make(("alpha", color, alpha, size), (*color, alpha), pg.SRCALPHA)
+
+    def blit(self, screen: pg.Surface, color: tuple[int, int, int], alpha: int,
+             precomposed: bool = False, pos: tuple[int, int] = (0, 0)) -> pg.Rect:
+        """
+        screenに単色のオーバーレイを重ねる
+        引数1 screen：画面Surface
+        引数2 color：色
+        引数3 alpha：透明度（0～255）
+        引数4 precomposed：Trueなら dst*(1-a) を乗算し，color*a を加算する（アルファ合成より軽い）
+        引数5 pos：左上の座標
+        """
+        size = screen.get_size()
+        if not precomposed:
+            return screen.blit(self.get(color, alpha, size), pos)
+        keep = 255 - alpha
+        mult = self._make(("mult", keep, size), (keep, keep, keep))
+        rect = screen.blit(mult, pos, special_flags=pg.BLEND_RGB_MULT)
+        add = tuple(c * alpha // 255 for c in color)
+        if any(add):  # 黒なら加算は不要
+            screen.blit(self._make(("add", add, size), add), pos, special_flags=pg.BLEND_RGB_ADD)
+        return rect
+
+
+OVERLAYS = OverlayCache()  # 全画面オーバーレイのキャッシュ
+
+
+class BackgroundLayer:
+    """
+    背景の1層．画像を敷き詰めた画面サイズのSurfaceを持ち，
+    スクロールしたらSurface.scrollでずらして，新しく見えた帯だけを描き足す
+    """
+    tiles: dict[tuple[str, bool], pg.Surface] = {}  # (画像, mirror)→敷き詰める1枚
+
+    def __init__(self, spec: dict):
+        """
+        引数 spec：{"image": 画像, "scroll": [x, y]（1フレームに動くピクセル数）, "mirror": 上下反転をつないで継ぎ目を消すか}
+        """
+        self.path = spec["image"]
+        self.scroll = tuple(spec.get("scroll", (0, 0)))
+        self.mirror = spec.get("mirror", False)
+        if len(self.scroll) != 2:
+            raise ValueError(f"{self.path}：scrollは[x, y]")
+        self.surface = None  # 画面サイズに敷き詰めた画像（最初に描くときに作る）
+        self.shown = (0, 0)  # surfaceに描いてある画像のずれ
+
+    def tile(self) -> pg.Surface:
+        """
+        敷き詰める1枚を返す（画像とmirrorの組み合わせごとに一度だけ作る）
+        """
+        key = (self.path, self.mirror)
+        tile = __class__.tiles.get(key)
+        if tile is None:
+            tile = ASSETS.load(self.path)
+            if self.mirror:
+                w, h = tile.get_size()
+                pair = pg.Surface((w, h * 2), tile.get_flags() & pg.SRCALPHA, tile)
+                pair.blit(tile, (0, 0))
+                pair.blit(pg.transform.flip(tile, False, True), (0, h))
+                tile = pair
+            __class__.tiles[key] = tile
+        return tile
+
+    def paint(self, rect: pg.Rect):
+        """
+        surfaceのrectの範囲に，ずれshownで画像を敷き詰める
+        """
+        tile = self.tile()
+        tw, th = tile.get_size()
+        ox, oy = self.shown
+        self.surface.set_clip(rect)
+        if self.surface.get_flags() & pg.SRCALPHA:
+            self.surface.fill((0, 0, 0, 0), rect)
+        x0 = rect.left - (rect.left - ox) % tw
+        y0 = rect.top - (rect.top - oy) % th
+        self.surface.blits([(tile, (x, y)) for y in range(y0, rect.bottom, th)
+                            for x in range(x0, rect.right, tw)], False)
+        self.surface.set_clip(None)
+
+    def advance(self, t: int) -> bool:
+        """
+        ステージ開始からtフレーム目の位置までスクロールする
+        戻り値：surfaceが変わったかどうか
+        """
+        shown = (math.floor(self.scroll[0] * t), math.floor(self.scroll[1] * t))
+        if self.surface is None:
+            flags = self.tile().get_flags() & pg.SRCALPHA
+            self.surface = pg.Surface((WIDTH, HEIGHT), flags)
+            if pg.display.get_surface() is not None:
+                self.surface = AssetManager._convert(self.surface)
+            self.shown = shown
+            self.paint(self.surface.get_rect())
+            return True
+        dx, dy = shown[0] - self.shown[0], shown[1] - self.shown[1]
+        if not (dx or dy):
+            return False
+        self.shown = shown
+        if abs(dx) >= WIDTH or abs(dy) >= HEIGHT:
+            self.paint(self.surface.get_rect())
+            return True
+        self.surface.scroll(dx, dy)
+        if dx:  # 新しく見えた縦の帯
+            self.paint(pg.Rect(0 if dx > 0 else WIDTH + dx, 0, abs(dx), HEIGHT))
+        if dy:  # 新しく見えた横の帯
+            self.paint(pg.Rect(0, 0 if dy > 0 else HEIGHT + dy, WIDTH, abs(dy)))
         return True
-    return False
+
+
+class Background:
+    """
+    ステージの背景．層（BackgroundLayer）を奥から順に重ね，層ごとの速さでスクロールさせる（視差）
+    層が1枚ならその層のSurfaceをそのまま使い，複数なら動いたフレームだけ重ね直す
+    """
+    DEFAULT = [{"image": "fig/pg_bg.jpg"}]  # ステージ定義に背景が無いとき
+
+    def __init__(self, spec: list[dict] | None = None):
+        """
+        引数 spec：層の定義のリスト（奥から順）
+        """
+        self.spec = spec
+        self.layers = [BackgroundLayer(layer) for layer in spec or __class__.DEFAULT]
+        self.scrolling = any(layer.scroll != (0, 0) for layer in self.layers)  # 毎フレーム全画面が変わるか
+        self.canvas = None  # 複数の層を重ねたSurface
+
+    def surface(self, t: int) -> pg.Surface:
+        """
+        ステージ開始からtフレーム目の背景を返す
+        戻り値：画面サイズの共有Surface（呼び出し側で直接書き換えないこと）
+        """
+        moved = [layer.advance(t) for layer in self.layers]
+        if len(self.layers) == 1:
+            return self.layers[0].surface
+        if self.canvas is None or any(moved):
+            if self.canvas is None:
+                self.canvas = self.layers[0].surface.copy()
+            self.canvas.blits([(layer.surface, (0, 0)) for layer in self.layers], False)
+        return self.canvas
+
+
+class Timer:
+    """
+    Schedulerに登録したコールバック（cancel()で取り消せる）
+    """
+    __slots__ = ("tick", "period", "func", "args", "cancelled")
+
+    def __init__(self, tick: int, period: int | None, func, args: tuple):
+        self.tick = tick  # 次に実行するtick
+        self.period = period  # 周期（Noneなら一度きり）
+        self.func = func
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler:
+    """
+    シミュレーションのtick（Game.tmr）を時刻として，一度きり・周期的なコールバックを実行するクラス
+    ヒープで次に実行するものだけを見るので，1tickの処理量は実行されるコールバックの数に比例する
+    """
+    def __init__(self):
+        self.heap: list[tuple[int, int, Timer]] = []
+        self.seq = 0  # 同じtickのコールバックを登録順に実行するための通し番号
+        self.now = 0  # 最後にrun_until()したtick
+
+    def _push(self, timer: Timer) -> Timer:
+        self.seq += 1
+        heapq.heappush(self.heap, (timer.tick, self.seq, timer))
+        return timer
+
+    def call_at(self, tick: int, func, *args) -> Timer:
+        """
+        tickになったらfunc(*args)を一度だけ実行する
+        """
+        return self._push(Timer(tick, None, func, args))
+
+    def call_later(self, delay: int, func, *args) -> Timer:
+        """
+        delay tick後にfunc(*args)を一度だけ実行する
+        """
+        return self.call_at(self.now + delay, func, *args)
+
+    def call_every(self, period: int, func, *args, start: int | None = None) -> Timer:
+        """
+        start（省略時は今からperiod後）からperiodごとにfunc(*args)を実行する
+        """
+        return self._push(Timer(self.now + period if start is None else start, period, func, args))
+
+    def run_until(self, tick: int) -> int:
+        """
+        tick以前に予定されたコールバックを順に実行する
+        戻り値：実行したコールバックの数
+        """
+        self.now = tick
+        heap = self.heap
+        count = 0
+        while heap and heap[0][0] <= tick:
+            _, _, timer = heapq.heappop(heap)
+            if timer.cancelled:
+                continue
+            count += 1
+            timer.func(*timer.args)
+            if timer.period is not None and not timer.cancelled:
+                timer.tick += timer.period
+                self._push(timer)
+        return count
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+
+class SpatialHash:
+    """
+    画面を一様な格子に分割し，各マスに重なるスプライトを登録するクラス
+    前回から格子上の範囲が変わったスプライトだけを登録し直す
+    """
+    def __init__(self, cell: int):
+        """
+        引数 cell：格子1マスの大きさ（px）
+        """
+        self.cell = cell
+        self.cols = WIDTH // cell + 1
+        self.rows = HEIGHT // cell + 1
+        self.cells: dict[tuple[int, int], dict[pg.sprite.Sprite, None]] = {}
+        self.spans: dict[pg.sprite.Sprite, tuple[int, int, int, int]] = {}
+
+    def span(self, rect: pg.Rect) -> tuple[int, int, int, int]:
+        """
+        Rectが重なるマスの範囲(左, 上, 右, 下)を返す（画面外は端のマスに寄せる）
+        """
+        c = self.cell
+        return (min(max(rect.left // c, 0), self.cols - 1),
+                min(max(rect.top // c, 0), self.rows - 1),
+                min(max((rect.right - 1) // c, 0), self.cols - 1),
+                min(max((rect.bottom - 1) // c, 0), self.rows - 1))
+
+    def insert(self, spr: pg.sprite.Sprite, span: tuple[int, int, int, int]):
+        self.spans[spr] = span
+        for x in range(span[0], span[2] + 1):
+            for y in range(span[1], span[3] + 1):
+                self.cells.setdefault((x, y), {})[spr] = None
+
+    def remove(self, spr: pg.sprite.Sprite):
+        span = self.spans.pop(spr, None)
+        if span is None:
+            return
+        for x in range(span[0], span[2] + 1):
+            for y in range(span[1], span[3] + 1):
+                del self.cells[(x, y)][spr]
+
+    def sync(self, group: pg.sprite.AbstractGroup):
+        """
+        グループの現在の状態に合わせて格子を更新する
+        引数 group：登録対象のスプライトグループ
+        """
+        for spr in [spr for spr in self.spans if spr not in group]:  # グループから消えたもの
+            self.remove(spr)
+        for spr in group:
+            span = self.span(spr.rect)
+            old = self.spans.get(spr)
+            if old != span:  # 別のマスに移ったものだけ登録し直す
+                if old is not None:
+                    self.remove(spr)
+                self.insert(spr, span)
+
+    def query(self, rect: pg.Rect) -> dict[pg.sprite.Sprite, None]:
+        """
+        rectと同じマスに登録されているスプライト（衝突候補）を返す
+        """
+        span = self.span(rect)
+        found = {}
+        for x in range(span[0], span[2] + 1):
+            for y in range(span[1], span[3] + 1):
+                cell = self.cells.get((x, y))
+                if cell:
+                    found.update(cell)
+        return found
+
+
+class MaskCache:
+    """
+    画像Surfaceごとの衝突判定用マスク（pg.mask）を保存するクラス
+    爆弾やビームの回転画像はATLASで共有されているので，マスクもスプライトごとではなく画像ごとに1回だけ作る
+    画像が使われなくなれば（弱参照で）マスクも捨てる
+    """
+    def __init__(self):
+        self.masks: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, img: pg.Surface) -> pg.mask.Mask:
+        """
+        画像の不透明な部分のマスクを返す
+        """
+        mask = self.masks.get(img)
+        if mask is None:
+            self.misses += 1
+            mask = pg.mask.from_surface(img)
+            self.masks[img] = mask
+        else:
+            self.hits += 1
+        return mask
+
+    def stats(self) -> dict[str, int]:
+        """
+        キャッシュの利用状況を辞書で返す
+        """
+        return {"hits": self.hits, "misses": self.misses, "masks": len(self.masks)}
+
+
+MASKS = MaskCache()  # 画像ごとの衝突判定用マスク
+
+
+class CollisionEngine:
+    """
+    空間ハッシュで候補を絞ってから衝突判定を行うクラス
+    pg.sprite.groupcollide／spritecollideと同じ削除・戻り値の仕様をもつ
+    mask=Trueを指定すると，Rectが重なったものだけ画像の不透明な部分どうしが重なるかも調べる
+    （スプライトにmask_imageがあればimageの代わりにその画像で調べる）
+    """
+    def __init__(self, cell: int = 64):
+        """
+        引数 cell：格子1マスの大きさ（px）
+        """
+        self.cell = cell
+        self.hashes: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def grid(self, group: pg.sprite.AbstractGroup) -> SpatialHash:
+        """
+        グループに対応する空間ハッシュを最新の状態にして返す
+        """
+        grid = self.hashes.get(group)
+        if grid is None:
+            grid = SpatialHash(self.cell)
+            self.hashes[group] = grid
+        grid.sync(group)
+        return grid
+
+    @staticmethod
+    def _collide(spr: pg.sprite.Sprite, grid: SpatialHash, dokill: bool,
+                 mask: bool = False) -> list[pg.sprite.Sprite]:
+        rect = spr.rect
+        if mask:  # 描いている画像がimageと違うスプライトはmask_imageを持つ（左上はrectに揃えて描く）
+            img = getattr(spr, "mask_image", spr.image)
+            rect = img.get_rect(topleft=rect.topleft)
+        hits = [other for other in grid.query(rect) if rect.colliderect(other.rect)]
+        if mask and hits:  # Rectが重なったものだけマスクで調べ直す
+            own = MASKS.get(img)
+            x, y = rect.topleft
+            hits = [other for other in hits
+                    if own.overlap(MASKS.get(other.image), (other.rect.x - x, other.rect.y - y))]
+        if dokill:
+            for other in hits:
+                other.kill()
+                grid.remove(other)
+        return hits
+
+    def spritecollide(self, spr: pg.sprite.Sprite, group: pg.sprite.AbstractGroup,
+                      dokill: bool, mask: bool = False) -> list[pg.sprite.Sprite]:
+        """
+        sprと衝突したgroup内のスプライトのリストを返す
+        引数3 dokill：Trueなら衝突したスプライトをkillする
+        引数4 mask：Trueなら画像の不透明な部分で判定する
+        """
+        if not group:
+            return []
+        return __class__._collide(spr, self.grid(group), dokill, mask)
+
+    def groupcollide(self, groupa: pg.sprite.AbstractGroup, groupb: pg.sprite.AbstractGroup,
+                     dokilla: bool, dokillb: bool, mask: bool = False) -> dict[pg.sprite.Sprite, list[pg.sprite.Sprite]]:
+        """
+        groupaの各スプライトと衝突したgroupbのスプライトを辞書で返す
+        引数3 dokilla：Trueなら衝突したgroupaのスプライトをkillする
+        引数4 dokillb：Trueなら衝突したgroupbのスプライトをkillする
+        引数5 mask：Trueなら画像の不透明な部分で判定する
+        """
+        crashed = {}
+        if not groupa or not groupb:  # どちらかが空なら衝突は起きない
+            return crashed
+        grid = self.grid(groupb)
+        for spr in groupa.sprites():
+            hits = __class__._collide(spr, grid, dokillb, mask)
+            if hits:
+                crashed[spr] = hits
+                if dokilla:
+                    spr.kill()
+        return crashed
+
+
+class ProjectileGroup(pg.sprite.Group):
+    """
+    爆弾やビームの位置・速度・状態・大きさをNumPy配列で保持するスプライトグループ
+    全弾の移動と画面外判定を1回のベクトル演算で行い，結果をRectに書き戻す
+    numpyが無い場合は通常のGroupと同じく各スプライトのupdate()を呼ぶ
+    """
+    STATES = {"active": 0, "inactive": 1}
+
+    def __init__(self, *sprites, capacity: int = 256):
+        self.slots: dict[pg.sprite.Sprite, int] = {}  # スプライト→配列の添字
+        self.owners: list[pg.sprite.Sprite | None] = []
+        self.free: list[int] = []  # 空いている添字
+        if np is not None:
+            self.pos = np.zeros((capacity, 2))  # Rectの左上座標
+            self.vel = np.zeros((capacity, 2))  # 方向ベクトル
+            self.speed = np.zeros(capacity)
+            self.state = np.zeros(capacity, dtype=np.int8)
+            self.size = np.zeros((capacity, 2))  # Rectの幅と高さ
+            self.alive = np.zeros(capacity, dtype=bool)
+        super().__init__(*sprites)
+
+    def _grow(self):
+        """
+        配列の容量を2倍にする
+        """
+        for name in ("pos", "vel", "speed", "state", "size", "alive"):
+            arr = getattr(self, name)
+            new = np.zeros((len(arr) * 2,) + arr.shape[1:], dtype=arr.dtype)
+            new[:len(arr)] = arr
+            setattr(self, name, new)
+
+    def _load(self, spr: pg.sprite.Sprite, i: int):
+        """
+        スプライトの属性を配列のi番目に読み込む
+        """
+        self.pos[i] = spr.rect.topleft
+        self.size[i] = spr.rect.size
+        self.vel[i] = spr.vx, spr.vy
+        self.speed[i] = getattr(spr, "speed", 1)
+        self.state[i] = __class__.STATES.get(getattr(spr, "state", "active"), 0)
+
+    def add_internal(self, spr: pg.sprite.Sprite, layer=None):
+        super().add_internal(spr, layer)
+        if np is None or spr in self.slots:
+            return
+        if self.free:
+            i = self.free.pop()
+        else:
+            i = len(self.owners)
+            self.owners.append(None)
+            if i >= len(self.alive):
+                self._grow()
+        self.slots[spr] = i
+        self.owners[i] = spr
+        self._load(spr, i)
+        self.alive[i] = True
+
+    def extend(self, sprites: list[pg.sprite.Sprite]):
+        """
+        複数のスプライトをまとめて追加する（配列へはスライスで一度に書き込む）
+        引数 sprites：追加するスプライトのリスト（一斉射撃の弾など）
+        """
+        if np is None:
+            return self.add(*sprites)
+        sprites = [spr for spr in sprites if spr not in self.slots]
+        if not sprites:
+            return
+        k = len(sprites)
+        reuse = min(k, len(self.free))
+        idx = self.free[len(self.free) - reuse:][::-1]
+        del self.free[len(self.free) - reuse:]
+        n = len(self.owners)
+        idx += range(n, n + k - reuse)
+        self.owners += [None] * (k - reuse)
+        while len(self.owners) > len(self.alive):
+            self._grow()
+        for spr, i in zip(sprites, idx):
+            pg.sprite.AbstractGroup.add_internal(self, spr)
+            spr.add_internal(self)
+            self.slots[spr] = i
+            self.owners[i] = spr
+        self.pos[idx] = [spr.rect.topleft for spr in sprites]
+        self.size[idx] = [spr.rect.size for spr in sprites]
+        self.vel[idx] = [(spr.vx, spr.vy) for spr in sprites]
+        self.speed[idx] = [getattr(spr, "speed", 1) for spr in sprites]
+        self.state[idx] = [__class__.STATES.get(getattr(spr, "state", "active"), 0) for spr in sprites]
+        self.alive[idx] = True
+
+    def remove_internal(self, spr: pg.sprite.Sprite):
+        super().remove_internal(spr)
+        i = self.slots.pop(spr, None)
+        if i is None:
+            return
+        self.owners[i] = None
+        self.alive[i] = False
+        self.vel[i] = 0
+        self.free.append(i)
+
+    def refresh(self):
+        """
+        スプライト側で変更された速度・状態（EMPなど）を配列に反映する
+        """
+        if np is None:
+            return
+        for spr, i in self.slots.items():
+            self._load(spr, i)
+
+    def update(self, *args, **kwargs):
+        """
+        全弾をspeed*方向ベクトルだけ移動させ，画面外に出たものをkillする
+        Rect.move_ipと同じく移動量は0方向へ切り捨てる
+        """
+        if np is None:
+            return super().update(*args, **kwargs)
+        n = len(self.owners)
+        if n == 0:
+            return
+        pos, size = self.pos[:n], self.size[:n]
+        pos += np.trunc(self.vel[:n] * self.speed[:n, None])
+        out = self.alive[:n] & ((pos[:, 0] < 0) | (pos[:, 0] + size[:, 0] > WIDTH) |
+                                (pos[:, 1] < 0) | (pos[:, 1] + size[:, 1] > HEIGHT))
+        for i in np.flatnonzero(out).tolist():
+            self.owners[i].kill()
+        live = np.flatnonzero(self.alive[:n])
+        owners = self.owners
+        for i, xy in zip(live.tolist(), pos[live].astype(int).tolist()):
+            owners[i].rect.topleft = xy
+
+
+class EnemyGroup(pg.sprite.Group):
+    """
+    敵機の中心のy座標・停止位置・速度・停止状態・爆弾投下の間隔と次の投下tickをNumPy配列で保持するスプライトグループ
+    全敵機の降下を1回のベクトル演算で行い，爆弾を投下する敵機は次の投下tickの配列から引く
+    numpyが無い場合は各敵機のupdate()を呼び，次の投下tickは敵機の属性next_fireを使う
+    """
+    def __init__(self, *sprites, capacity: int = 64):
+        self.slots: dict[pg.sprite.Sprite, int] = {}  # スプライト→配列の添字
+        self.owners: list[pg.sprite.Sprite | None] = []
+        self.free: list[int] = []  # 空いている添字
+        if np is not None:
+            self.cy = np.zeros(capacity, dtype=np.int64)  # Rectの中心のy座標
+            self.bound = np.zeros(capacity, dtype=np.int64)  # 停止位置
+            self.vy = np.zeros(capacity, dtype=np.int64)
+            self.stopped = np.zeros(capacity, dtype=bool)
+            self.interval = np.full(capacity, np.inf)  # 爆弾投下の間隔（EMP中はinf）
+            self.next_fire = np.full(capacity, -1, dtype=np.int64)  # 次に爆弾を投下するtick（-1なら未予約）
+            self.alive = np.zeros(capacity, dtype=bool)
+        super().__init__(*sprites)
+
+    def _grow(self):
+        """
+        配列の容量を2倍にする
+        """
+        for name in ("cy", "bound", "vy", "stopped", "interval", "next_fire", "alive"):
+            arr = getattr(self, name)
+            new = np.zeros(len(arr) * 2, dtype=arr.dtype)
+            new[:len(arr)] = arr
+            setattr(self, name, new)
+
+    def _load(self, emy: "Enemy", i: int):
+        """
+        敵機の属性を配列のi番目に読み込む
+        """
+        self.cy[i] = emy.rect.centery
+        self.bound[i] = emy.bound
+        self.vy[i] = emy.vy
+        self.stopped[i] = emy.state == "stop"
+        self.interval[i] = emy.interval
+        self.next_fire[i] = emy.next_fire
+
+    def add_internal(self, emy: "Enemy", layer=None):
+        super().add_internal(emy, layer)
+        if np is None or emy in self.slots:
+            return
+        if self.free:
+            i = self.free.pop()
+        else:
+            i = len(self.owners)
+            self.owners.append(None)
+            if i >= len(self.alive):
+                self._grow()
+        self.slots[emy] = i
+        self.owners[i] = emy
+        self._load(emy, i)
+        self.alive[i] = True
+
+    def remove_internal(self, emy: "Enemy"):
+        super().remove_internal(emy)
+        i = self.slots.pop(emy, None)
+        if i is None:
+            return
+        self.owners[i] = None
+        self.alive[i] = False
+        self.next_fire[i] = -1
+        self.free.append(i)
+
+    def refresh(self):
+        """
+        敵機側で変更された爆弾投下の間隔（EMPなど）を配列に反映する
+        """
+        if np is None:
+            return
+        for emy, i in self.slots.items():
+            self.interval[i] = emy.interval
+
+    def arm(self, emy: "Enemy", earliest: int):
+        """
+        earliest以降で最初のintervalの倍数のtickに，敵機の爆弾投下を予約する（停止前・EMP中は予約しない）
+        """
+        tick = -1
+        if emy.state == "stop" and emy.interval != float("inf"):
+            tick = -(-earliest // emy.interval) * emy.interval
+        emy.next_fire = tick
+        i = self.slots.get(emy)
+        if i is not None:
+            self.next_fire[i] = tick
+
+    def due(self, tick: int) -> list["Enemy"]:
+        """
+        tickに爆弾を投下する敵機のリストを返し，それぞれ次の投下をinterval後に予約する
+        """
+        if np is None:
+            fire = [emy for emy in self if emy.next_fire == tick and emy.interval != float("inf")]
+            for emy in fire:
+                emy.next_fire = tick + emy.interval
+            return fire
+        n = len(self.owners)
+        hit = np.flatnonzero(self.next_fire[:n] == tick)
+        if not len(hit):
+            return []
+        ok = hit[np.isfinite(self.interval[hit])]  # EMP中の敵機は投下せず，予約も消える（解除時に予約し直す）
+        self.next_fire[hit] = -1
+        self.next_fire[ok] = tick + self.interval[ok].astype(np.int64)
+        owners = self.owners
+        fire = []
+        for i, nxt in zip(ok.tolist(), self.next_fire[ok].tolist()):
+            owners[i].next_fire = nxt
+            fire.append(owners[i])
+        return fire
+
+    def in_phase(self, tick: int) -> list["Enemy"]:
+        """
+        停止中で，tickがintervalの倍数に当たる敵機のリストを返す
+        """
+        if np is None:
+            return [emy for emy in self if emy.state == "stop" and tick % emy.interval == 0]
+        n = len(self.owners)
+        hit = np.flatnonzero(self.alive[:n] & self.stopped[:n] & (tick % self.interval[:n] == 0))
+        return [self.owners[i] for i in hit.tolist()]
+
+    def update(self, *args, **kwargs):
+        """
+        降下中の全敵機をvyだけ動かし，停止位置を越えたものを停止状態にする（Enemy.updateと同じ動き）
+        """
+        if np is None:
+            return super().update(*args, **kwargs)
+        n = len(self.owners)
+        if n == 0:
+            return
+        moving = self.alive[:n] & ~self.stopped[:n]
+        if not moving.any():
+            return
+        cy = self.cy[:n]
+        stop = np.flatnonzero(moving & (cy > self.bound[:n]))
+        self.stopped[stop] = True
+        self.vy[stop] = 0
+        cy[moving] += self.vy[:n][moving]
+        owners = self.owners
+        for i, y in zip(np.flatnonzero(moving).tolist(), cy[moving].tolist()):
+            owners[i].rect.centery = y
+        for i in stop.tolist():  # 停止したときの処理は1機につき1回だけ
+            emy = owners[i]
+            emy.vy = 0
+            emy.state = "stop"
+            if emy.on_stop is not None:
+                emy.on_stop(emy)
+
+
+class SpritePool:
+    """
+    kill()されたスプライトを保管し，次の生成時に__init__し直して再利用するクラス
+    """
+    def __init__(self, cls: type, limit: int = 4096):
+        """
+        引数1 cls：保管するスプライトのクラス
+        引数2 limit：保管する数の上限
+        """
+        self.cls = cls
+        self.limit = limit
+        self.free: list[pg.sprite.Sprite] = []
+        self.hits = 0  # 再利用できた回数
+        self.misses = 0  # 新しく生成した回数
+        self.in_use = 0  # 使用中の数
+        self.high_water = 0  # 使用中の数の最大値
+
+    def blank(self) -> pg.sprite.Sprite:
+        """
+        __init__を呼ばずにスプライトを返す（属性は呼び出し側ですべて設定する）
+        """
+        if self.free:
+            self.hits += 1
+            spr = self.free.pop()
+        else:
+            self.misses += 1
+            spr = self.cls.__new__(self.cls)
+            pg.sprite.Sprite.__init__(spr)
+        self.in_use += 1
+        self.high_water = max(self.high_water, self.in_use)
+        return spr
+
+    def acquire(self, *args, **kwargs) -> pg.sprite.Sprite:
+        """
+        保管中のスプライトを初期化し直して返す（無ければ新しく生成する）
+        引数：クラスの__init__と同じ
+        """
+        if self.free:
+            self.hits += 1
+            spr = self.free.pop()
+            spr.__init__(*args, **kwargs)
+        else:
+            self.misses += 1
+            spr = self.cls(*args, **kwargs)
+        self.in_use += 1
+        self.high_water = max(self.high_water, self.in_use)
+        return spr
+
+    def release(self, spr: pg.sprite.Sprite):
+        """
+        スプライトを保管する
+        """
+        self.in_use = max(0, self.in_use - 1)
+        if len(self.free) < self.limit:
+            self.free.append(spr)
+
+    def reset(self):
+        """
+        使用中の数と最大値を0に戻す（前のゲームのスプライトはプールに戻らないまま捨てられるため）
+        """
+        self.in_use = 0
+        self.high_water = 0
+
+    def stats(self) -> dict[str, int]:
+        """
+        プールの利用状況を辞書で返す
+        """
+        return {"hits": self.hits, "misses": self.misses, "free": len(self.free),
+                "in_use": self.in_use, "high_water": self.high_water}
+
+
+class PooledSprite(pg.sprite.Sprite):
+    """
+    kill()やGroup.empty()でどのグループにも属さなくなると自分のクラスのプールに戻るスプライト
+    サブクラスごとにSpritePoolを1つ持ち，acquire()で生成する
+    """
+    pool: SpritePool
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.pool = SpritePool(cls)
+
+    @classmethod
+    def acquire(cls, *args, **kwargs) -> "PooledSprite":
+        """
+        プールからインスタンスを取り出す（引数は__init__と同じ）
+        """
+        return cls.pool.acquire(*args, **kwargs)
+
+    @classmethod
+    def blank(cls) -> "PooledSprite":
+        """
+        プールから__init__していないインスタンスを取り出す（一斉射撃用）
+        """
+        return cls.pool.blank()
+
+    @staticmethod
+    def reset_pools():
+        """
+        全サブクラスのプールの使用中の数と最大値を0に戻す（新しいゲームを始めるときに呼ぶ）
+        """
+        for cls in PooledSprite.__subclasses__():
+            cls.pool.reset()
+
+    def kill(self):
+        alive = self.alive()
+        super().kill()
+        if alive:  # 二重にkillされてもプールには1回だけ戻す
+            self.pool.release(self)
+
+    def remove_internal(self, group: pg.sprite.AbstractGroup):
+        """
+        Group.empty()やGroup.remove()で外されたとき（kill()はこれを呼ばない）
+        """
+        super().remove_internal(group)
+        if not self.alive():  # どのグループにも属さなくなったらプールに戻す
+            self.pool.release(self)
+
+
+SPREADS = {}  # 一斉射撃の広がり方の名前: 基準方向からの角度（度）のリストを返す関数
+
+
+def spread(name: str):
+    """
+    一斉射撃の広がり方をSPREADSに登録するデコレータ
+    登録する関数は(count, step=0, **opts)を受け取り，count個の角度を返す
+    （stepは何回目の射撃か．渦巻きなど射撃ごとに変わる広がり方に使う）
+    """
+    def register(func):
+        SPREADS[name] = func
+        return func
+    return register
+
+
+@spread("fan")
+def spread_fan(count: int, step: int = 0, width: int = 100) -> list[float]:
+    """
+    基準方向を中心にwidth度の扇形に等間隔で広げる（countが大きくても必ずcount個返す）
+    """
+    if count <= 1:
+        return [0]
+    return [-width / 2 + i * width / (count - 1) for i in range(count)]
+
+
+@spread("ring")
+def spread_ring(count: int, step: int = 0, phase: float = 0) -> list[float]:
+    """
+    全方位に等間隔で広げる
+    """
+    return [phase + 360 * i / count for i in range(count)]
+
+
+@spread("spiral")
+def spread_spiral(count: int, step: int = 0, rate: float = 12) -> list[float]:
+    """
+    全方位に等間隔で広げ，射撃ごとにrate度ずつ回す
+    """
+    return spread_ring(count, phase=step * rate)
+
+
+@spread("aimed")
+def spread_aimed(count: int, step: int = 0, jitter: float = 8) -> list[float]:
+    """
+    基準方向（狙った方向）の±jitter度にばらつかせる
+    """
+    return [random.uniform(-jitter, jitter) for _ in range(count)]
+
+
+def spread_vectors(base: float, offsets: list[float]) -> tuple[list[float], list[float], list[float]]:
+    """
+    基準角度base（度）に各offsetsを足した角度と，その方向ベクトル（cos, sin）をまとめて計算する
+    戻り値：角度，cos，sinのリストのタプル
+    """
+    if np is None:
+        angles = [base + off for off in offsets]
+        rads = [math.radians(a) for a in angles]
+        return angles, [math.cos(r) for r in rads], [math.sin(r) for r in rads]
+    angles = base + np.asarray(offsets, dtype=float)
+    rads = np.radians(angles)
+    return angles.tolist(), np.cos(rads).tolist(), np.sin(rads).tolist()
 
 
 class Bird(pg.sprite.Sprite):
@@ -90,6 +1475,7 @@ class Bird(pg.sprite.Sprite):
         pg.K_a: (-1, 0),
         pg.K_d: (+1, 0),
     }
+    delta_dires = [(+1, 0), (+1, -1), (0, -1), (-1, -1), (-1, 0), (-1, +1), (0, +1), (+1, +1)]  # 移動方向の一覧
 
     def __init__(self, num: int, xy: tuple[int, int]):
         """
@@ -98,41 +1484,45 @@ class Bird(pg.sprite.Sprite):
         引数2 xy：こうかとん画像の位置座標タプル
         """
         super().__init__()
-        img0 = pg.transform.rotozoom(pg.image.load(f"fig/{num}.png"), 0, 0.9)
-        img = pg.transform.flip(img0, True, False)  # デフォルトのこうかとん
-        self.imgs = {
-            (+1, 0): img,  # 右
-            (+1, -1): pg.transform.rotozoom(img, 45, 0.9),  # 右上
-            (0, -1): pg.transform.rotozoom(img, 90, 0.9),  # 上
-            (-1, -1): pg.transform.rotozoom(img0, -45, 0.9),  # 左上
-            (-1, 0): img0,  # 左
-            (-1, +1): pg.transform.rotozoom(img0, 45, 0.9),  # 左下
-            (0, +1): pg.transform.rotozoom(img, -90, 0.9),  # 下
-            (+1, +1): pg.transform.rotozoom(img, -45, 0.9),  # 右下
-        }
+        POSES.preload(num)  # 移動方向ごとの画像（初回だけ生成）
+        self.num = num
         self.dire = (+1, 0)
-        self.image = self.imgs[self.dire]
+        self.pose = ("move", num, self.dire)  # 現在の姿勢（POSESのキー）
+        self.image = POSES.get(self.pose)
         self.rect = self.image.get_rect()
         self.rect.center = xy
         self.speed = 10
         self.state="normal"  # 初期状態は通常
         self.hyper_life=0  # 発動時間の変数
+        self.lclick = False  # 左クリック中かどうか
+        self.senkai = 0  # 照準の角度
+
+    def end_hyper(self):
+        """
+        無敵状態を終了する（Game.schedで発動時間の終わりに呼ばれる）
+        """
+        self.state = "normal"
 
-    def change_img(self, num: int, screen: pg.Surface):
+    def change_img(self, num: int, screen: pg.Surface | None = None):
         """
         こうかとん画像を切り替え，画面に転送する
         引数1 num：こうかとん画像ファイル名の番号
-        引数2 screen：画面Surface
+        引数2 screen：画面Surface（Noneなら画像の切り替えのみ）
         """
-        self.image = pg.transform.rotozoom(pg.image.load(f"fig/{num}.png"), 0, 0.9)
-        screen.blit(self.image, self.rect)
+        self.pose = ("face", num)
+        self.image = POSES.get(self.pose, self.state == "hyper")
+        if screen is not None:
+            screen.blit(self.image, self.rect)
 
-    def update(self, key_lst: list[bool], lclick, senkai, screen: pg.Surface):
+    def update(self, key_lst: "InputFrame", lclick: bool, senkai: float):
         """
         押下キーに応じてこうかとんを移動させる
-        引数1 key_lst：押下キーの真理値リスト
-        引数2 screen：画面Surface
+        引数1 key_lst：押下キーの真理値リスト（キーコードで添字参照できるもの）
+        引数2 lclick：左クリック中かどうか
+        引数3 senkai：照準の角度
         """
+        self.lclick = lclick
+        self.senkai = senkai
         sum_mv = [0, 0]
         for k, mv in __class__.delta.items():
             if key_lst[k]:
@@ -143,35 +1533,41 @@ class Bird(pg.sprite.Sprite):
             self.rect.move_ip(-self.speed*sum_mv[0], -self.speed*sum_mv[1])
         if not (sum_mv[0] == 0 and sum_mv[1] == 0):
             self.dire = tuple(sum_mv)
-            self.image = self.imgs[self.dire]
-        if self.state == "hyper":
-            self.image = pg.transform.laplacian(self.image)  # 無敵時の画像変換
-            self.hyper_life -= 1
-            if self.hyper_life < 0:
-                self.state = "normal"  # 無敵状態終了
-
-        if lclick is True:  # beamから向き判定の適用
-        #     screen.blit(self.image, self.rect)
-        # else:
-        #     screen.blit(pg.transform.rotozoom(pg.transform.flip(img0, True, True), self.angle, 0.9), self.rect)
-            if senkai <= 90:  #右半分
-                self.birdimg = pg.transform.rotozoom(pg.transform.flip(pg.transform.rotozoom(pg.image.load(f"fig/3.png"), 0, 1), True, False), senkai, 1.1)
-            else:  # 左半分
-                self.birdimg = pg.transform.rotozoom(pg.transform.flip(pg.transform.rotozoom(pg.image.load(f"fig/3.png"), 0, 1), True, True), senkai, 1.1)
-            screen.blit(self.birdimg, self.rect)
-        else:
-            screen.blit(self.image, self.rect)
+            self.pose = ("move", self.num, self.dire)
+        self.image = POSES.get(self.pose, self.state == "hyper")  # 無敵時はラプラシアン済みの画像
 
         if key_lst[pg.K_LSHIFT]:
             self.speed = 20
         else:
             self.speed = 10
 
+    def draw(self, screen: pg.Surface) -> pg.Rect:
+        """
+        こうかとんを画面に転送する（左クリック中は照準の向きの画像）
+        引数 screen：画面Surface
+        戻り値：描画した範囲のRect
+        """
+        if self.lclick is True:  # beamから向き判定の適用（右半分／左半分で反転を変える）
+            return screen.blit(POSES.get(POSES.aim_key(self.senkai)), self.rect)
+        else:
+            return screen.blit(self.image, self.rect)
 
-class Bomb(pg.sprite.Sprite):
+    @property
+    def mask_image(self) -> pg.Surface:
+        """
+        マスクでの衝突判定に使う画像（draw()で描いている姿勢の画像）
+        無敵時のラプラシアン画像は輪郭だけで爆弾がすり抜けるので，元の画像を使う
+        """
+        if self.lclick is True:
+            return POSES.get(POSES.aim_key(self.senkai))
+        return POSES.get(self.pose)
+
+
+class Bomb(PooledSprite):
     """
     爆弾に関するクラス
     """
+
     def __init__(self, emy: "Enemy", bird: Bird, speed: int , angle0: float=0):
         """
         爆弾Surfaceを生成する
@@ -183,23 +1579,10 @@ class Bomb(pg.sprite.Sprite):
         super().__init__()
         self.state = "active"
         size = random.randint(30, 80)  # 爆弾のサイズ：30以上80以下の乱数
-        img = pg.image.load(f"fig/bomb.png")
-        img_width, img_height = img.get_size()  # 元の画像の縦横比を取得
-        if img_width > img_height:
-            # 幅を基準にリサイズ
-            height = size
-            width = int((img_width / img_height) * height)
-        else:
-            # 高さを基準にリサイズ
-            width = size
-            height = int((img_height / img_width) * width)
-
-        self.image = pg.transform.scale(img, (width, height))
-        self.rect = self.image.get_rect()
         # 爆弾を投下するemyから見た攻撃対象のbirdの方向を計算
         self.vx, self.vy = calc_orientation(emy.rect, bird.rect)  
         self.angle = math.degrees(math.atan2(self.vy, self.vx))  # 角度を計算（上方向が0度になるように）
-        self.image = pg.transform.rotozoom(self.image, self.angle, 1.0)  # 爆弾画像を回転
+        self.image = ATLAS.get("fig/bomb.png", self.angle, size)  # 縮小・回転済みの爆弾画像
         self.rect = self.image.get_rect(center=(emy.rect.centerx, emy.rect.centery + emy.rect.height // 2))  # 回転後に中心を再設定
 
         angle0 += self.angle  # 追加されたangle0との合成
@@ -210,6 +1593,32 @@ class Bomb(pg.sprite.Sprite):
         self.rect.centerx = emy.rect.centerx + emy.rect.width * self.vx
         self.speed = speed
 
+    @classmethod
+    def volley(cls, emy: "Enemy", bird: Bird, speed: int, offsets: list[float]) -> list["Bomb"]:
+        """
+        こうかとんへの方向からoffsets（度）だけずらした爆弾をまとめて生成する
+        方向と画像（大きさも1つの一斉射撃で共通）は1回だけ計算する
+        """
+        size = random.randint(30, 80)
+        vx, vy = calc_orientation(emy.rect, bird.rect)
+        angle = math.degrees(math.atan2(vy, vx))
+        image = ATLAS.get("fig/bomb.png", angle, size)
+        _, cos, sin = spread_vectors(angle, offsets)
+        er = emy.rect
+        bombs = []
+        for c, s in zip(cos, sin):
+            bomb = cls.blank()
+            bomb.state = "active"
+            bomb.image = image
+            bomb.rect = image.get_rect()
+            bomb.rect.centery = er.centery + er.height * s
+            bomb.rect.centerx = er.centerx + er.width * c
+            bomb.vx, bomb.vy = c, s
+            bomb.angle = angle
+            bomb.speed = speed
+            bombs.append(bomb)
+        return bombs
+
     def update(self):
         """
         爆弾を速度ベクトルself.vx, self.vyに基づき移動させる
@@ -220,27 +1629,29 @@ class Bomb(pg.sprite.Sprite):
             self.kill()
 
 
-class Beam(pg.sprite.Sprite):
+class Beam(PooledSprite):
     """
     ビームに関するクラス
     """
-    def __init__(self, bird: Bird, angle0: float=0):
+
+    def __init__(self, bird: Bird, angle0: float=0, mouse_pos: tuple[int, int] | None = None):
         """
         ビーム画像Surfaceを生成する
         取得したマウスカーソルの座標に向けて、こうかとんから飛んでいく
         引数 bird：ビームを放つこうかとん
         引数 angle：ビームの発射角度（Noneの場合、マウス方向）
+        引数 mouse_pos：照準の座標（Noneなら現在のマウスカーソルの座標）
         """
         super().__init__()
         self.vx, self.vy = bird.dire 
-        mousex, mousey = pg.mouse.get_pos()
+        mousex, mousey = pg.mouse.get_pos() if mouse_pos is None else mouse_pos
         angle = 90 + math.degrees(math.atan2(bird.rect.centerx - mousex, bird.rect.centery - mousey))  # atan2が三角関数より弧度法で算出, degreesで度数法に変換
         self.angle = angle
         rad_angle = math.radians(angle)
         self.vx = math.cos(rad_angle)
         self.vy = -math.sin(rad_angle)
         angle0 += self.angle  # 追加されたangle0との合成
-        self.image = pg.transform.rotozoom(pg.image.load(f"fig/beam.png"), angle0, 1.0)
+        self.image = ATLAS.get("fig/beam.png", angle0)
         rad_angle0 = math.radians(angle0)
         self.vx = math.cos(rad_angle0)
         self.vy = -math.sin(rad_angle0)
@@ -249,6 +1660,28 @@ class Beam(pg.sprite.Sprite):
         self.rect.centerx = bird.rect.centerx + bird.rect.width * self.vx
         self.speed = 10
 
+    @classmethod
+    def volley(cls, bird: Bird, offsets: list[float], mouse_pos: tuple[int, int] | None = None) -> list["Beam"]:
+        """
+        照準の方向からoffsets（度）だけずらしたビームをまとめて生成する
+        照準の方向は1回だけ計算し，画像は角度ごとにATLASから取り出す
+        """
+        mousex, mousey = pg.mouse.get_pos() if mouse_pos is None else mouse_pos
+        angle = 90 + math.degrees(math.atan2(bird.rect.centerx - mousex, bird.rect.centery - mousey))
+        br = bird.rect
+        beams = []
+        for angle0, c, s in zip(*spread_vectors(angle, offsets)):
+            beam = cls.blank()
+            beam.angle = angle
+            beam.image = ATLAS.get("fig/beam.png", angle0)
+            beam.vx, beam.vy = c, -s
+            beam.rect = beam.image.get_rect()
+            beam.rect.centery = br.centery + br.height * beam.vy
+            beam.rect.centerx = br.centerx + br.width * beam.vx
+            beam.speed = 10
+            beams.append(beam)
+        return beams
+
     def update(self, bird: Bird, screen: pg.surface):
         """
         ビームを速度ベクトルself.vx, self.vyに基づき移動させる
@@ -263,72 +1696,213 @@ class Beam(pg.sprite.Sprite):
         return self.angle
 
 
-class Explosion(pg.sprite.Sprite):
+class EffectSheet:
     """
-    爆発に関するクラス
+    エフェクトのコマ画像の並び（全エフェクトで共有する）
+    period：periodフレームごとにコマを切り替え，残り時間から数えて循環させる（爆発の点滅）
+    period=None：寿命全体にコマを均等に割り振る（広がって消えるエフェクト）
     """
-    def __init__(self, obj: "Bomb|Enemy", life: int):
+    def __init__(self, frames: list[pg.Surface], period: int | None = None):
+        self.frames = frames
+        self.period = period
+        w, h = frames[0].get_size()
+        self.offset = (w // 2, h // 2)  # 中心から左上までのずれ（コマはすべて同じ大きさ）
+
+    def frame_index(self, age, life):
         """
-        爆弾が爆発するエフェクトを生成する
-        引数1 obj：爆発するBombまたは敵機インスタンス
-        引数2 life：爆発時間
+        経過フレーム数ageと寿命lifeからコマ番号を返す（intでもNumPy配列でもよい）
         """
-        super().__init__()
-        img = pg.image.load(f"fig/explosion.gif")
-        self.imgs = [img, pg.transform.flip(img, 1, 1)]
-        self.image = self.imgs[0]
-        self.rect = self.image.get_rect(center=obj.rect.center)
-        self.life = life
+        n = len(self.frames)
+        if self.period is None:
+            return age * n // life
+        return (life - 1 - age) // self.period % n
 
-    def update(self):
+
+class EffectSheets:
+    """
+    エフェクトの種類（と大きさ）ごとにEffectSheetを一度だけ作って共有するクラス
+    """
+    BOOM_FRAMES = 6  # boomのコマ数
+    BOOM_STEP = 16  # boomの大きさの刻み（大きさごとにコマを作るので丸める）
+
+    def __init__(self):
+        self.items: dict[tuple, EffectSheet] = {}
+
+    def get(self, kind: str, size: int = 0) -> EffectSheet:
         """
-        爆発時間を1減算した爆発経過時間_lifeに応じて爆発画像を切り替えることで
-        爆発エフェクトを表現する
+        引数1 kind："explosion"（爆発画像と反転画像の点滅）か"boom"（広がりながら消える閃光）
+        引数2 size：boomの直径
         """
-        self.life -= 1
-        self.image = self.imgs[self.life//10%2]
-        if self.life < 0:
-            self.kill()
+        if kind == "boom":
+            size = max(__class__.BOOM_STEP, round(size / __class__.BOOM_STEP) * __class__.BOOM_STEP)
+        else:
+            size = 0
+        key = (kind, size)
+        sheet = self.items.get(key)
+        if sheet is None:
+            sheet = getattr(self, f"_{kind}")(size)
+            self.items[key] = sheet
+        return sheet
+
+    @staticmethod
+    def _keyed(img: pg.Surface, key: tuple[int, int, int] = (255, 0, 255)) -> pg.Surface:
+        """
+        透明度が0か255だけの画像を，RLEのカラーキー付きSurfaceに描き直す（アルファ合成より何倍も速く描ける）
+        """
+        keyed = pg.Surface(img.get_size())
+        if pg.display.get_surface() is not None:
+            keyed = keyed.convert()
+        keyed.fill(key)
+        keyed.blit(img, (0, 0))
+        keyed.set_colorkey(key, pg.RLEACCEL)
+        return keyed
+
+    def _explosion(self, size: int) -> EffectSheet:
+        img = ASSETS.load("fig/explosion.gif")
+        return EffectSheet([__class__._keyed(img), __class__._keyed(pg.transform.flip(img, 1, 1))], period=10)
+
+    def _boom(self, size: int) -> EffectSheet:
+        img = ASSETS.load("fig/boom.png")
+        n = __class__.BOOM_FRAMES
+        frames = []
+        for i in range(n):
+            scale = 0.5 + 0.5 * i / (n - 1)
+            part = pg.transform.smoothscale(img, (round(size * scale), round(size * scale)))
+            frame = pg.Surface((size, size), pg.SRCALPHA)
+            frame.blit(part, part.get_rect(center=(size // 2, size // 2)))
+            fade = 255 - 200 * i // (n - 1)
+            frame.fill((255, 255, 255, fade), special_flags=pg.BLEND_RGBA_MULT)  # 後のコマほど薄くする
+            frames.append(frame)
+        return EffectSheet(frames)
+
+
+SHEETS = EffectSheets()  # エフェクトのコマ画像のキャッシュ
+
+
+class EffectBatch:
+    """
+    爆発などのエフェクトを配列（中心座標，発生tick，寿命，コマ画像の種類）で管理し，
+    全エフェクトをSurface.blitsの1回で描くクラス（1つずつのスプライトやタイマーは作らない）
+    numpyが無い場合は同じ値をタプルのリストで持つ
+    """
+    COLUMNS = ("x", "y", "born", "life", "sheet")
+
+    def __init__(self, capacity: int = 64):
+        self.sheets: list[EffectSheet] = []  # 使ったEffectSheet（sheet列はこの添字）
+        self.frames: list[pg.Surface] = []  # 使ったEffectSheetのコマを並べたもの
+        self.base: list[int] = []  # EffectSheetごとの最初のコマのframesでの添字
+        self.n = 0  # 生きているエフェクトの数
+        if np is not None:
+            for name in __class__.COLUMNS:
+                setattr(self, name, np.zeros(capacity, dtype=np.int64))
+        else:
+            self.items: list[tuple[int, int, int, int, int]] = []
 
+    def __len__(self) -> int:
+        return self.n
 
-# class Boom(pg.sprite.Sprite):
-#     """
-#     爆発に関するクラス
-#     """
-#     def __init__(self, obj: "Bomb", screen: pg.Surface):
-#         """
-#         爆弾がこうかとんと衝突して爆発するエフェクトを生成する
-#         引数1 obj：爆発するBombインスタンス
-#         引数2 life：爆発時間
-#         """
-#         super().__init__()
-#         img = pg.image.load(f"fig/boom.png")
-#         self.image = pg.transform.scale(img, (obj.rect.width*2, obj.rect.height*2))  # 爆弾のサイズに合わせる
-#         self.rect = self.image.get_rect(center=obj.rect.center)
-#         screen.blit(self.image, self.rect)
-    
-#     def update(self):
-#         """
-#         爆発エフェクトを表現する
-#         """
-#         self.screen.blit(self.image, self.rect)
+    def _sheet_id(self, sheet: EffectSheet) -> int:
+        for i, s in enumerate(self.sheets):
+            if s is sheet:
+                return i
+        self.sheets.append(sheet)
+        self.base.append(len(self.frames))
+        self.frames += sheet.frames
+        return len(self.sheets) - 1
+
+    def add(self, sheet: EffectSheet, center: tuple[int, int], born: int, life: int):
+        """
+        エフェクトを1つ追加する
+        引数1 sheet：コマ画像
+        引数2 center：中心座標
+        引数3 born：発生したtick
+        引数4 life：表示するフレーム数
+        """
+        row = (center[0], center[1], born, life, self._sheet_id(sheet))
+        if np is None:
+            self.items.append(row)
+        else:
+            if self.n == len(self.x):
+                for name in __class__.COLUMNS:
+                    arr = getattr(self, name)
+                    setattr(self, name, np.concatenate([arr, np.zeros_like(arr)]))
+            for name, value in zip(__class__.COLUMNS, row):
+                getattr(self, name)[self.n] = value
+        self.n += 1
+
+    def update(self, now: int):
+        """
+        寿命が尽きたエフェクトを取り除く（生きているものを前に詰める）
+        引数 now：今のtick
+        """
+        if np is None:
+            self.items = [row for row in self.items if now - row[2] < row[3]]
+            self.n = len(self.items)
+            return
+        n = self.n
+        keep = now - self.born[:n] < self.life[:n]
+        k = int(keep.sum())
+        if k == n:
+            return
+        for name in __class__.COLUMNS:
+            arr = getattr(self, name)
+            arr[:k] = arr[:n][keep]
+        self.n = k
+
+    def clear(self):
+        self.n = 0
+        if np is None:
+            self.items = []
+
+    def draw(self, screen: pg.Surface, now: int) -> list[pg.Rect]:
+        """
+        全エフェクトのnow tick時点のコマをまとめて描く
+        戻り値：描画した範囲のリスト
+        """
+        if not self.n:
+            return []
+        sheets = self.sheets
+        if np is None:
+            seq = []
+            for x, y, born, life, sid in self.items:
+                sheet = sheets[sid]
+                ox, oy = sheet.offset
+                seq.append((sheet.frames[sheet.frame_index(now - born, life)], (x - ox, y - oy)))
+            return screen.blits(seq)
+        n = self.n
+        sid = self.sheet[:n]
+        age, life = now - self.born[:n], self.life[:n]
+        frame = np.array(self.base)[sid]
+        for i, sheet in enumerate(sheets):  # コマ番号は種類ごとに一括で計算する
+            mask = sid == i
+            if mask.any():
+                frame[mask] += sheet.frame_index(age[mask], life[mask])
+        offset = np.array([sheet.offset for sheet in sheets])[sid]
+        left, top = self.x[:n] - offset[:, 0], self.y[:n] - offset[:, 1]
+        frames = self.frames
+        return screen.blits(list(zip([frames[f] for f in frame.tolist()], zip(left.tolist(), top.tolist()))))
 
 
 class Enemy(pg.sprite.Sprite):
     """
     敵機に関するクラス
     """
-    imgs = [pg.image.load(f"fig/alien{i}.png") for i in range(1, 4)]
+    imgs = None  # 全Enemyで共有する縮小済みの敵機画像（最初の生成時に作る）
     
     def __init__(self):
         super().__init__()
-        self.image = pg.transform.rotozoom(random.choice(__class__.imgs), 0, 0.8)
+        if __class__.imgs is None:
+            __class__.imgs = [pg.transform.rotozoom(ASSETS.load(f"fig/alien{i}.png"), 0, 0.8) for i in range(1, 4)]
+        self.image = random.choice(__class__.imgs)
         self.rect = self.image.get_rect()
         self.rect.center = random.randint(0, WIDTH), 0
         self.vx, self.vy = 0, +6
         self.bound = random.randint(50, HEIGHT//2)  # 停止位置
         self.state = "down"  # 降下状態or停止状態
         self.interval = random.randint(50, 300)  # 爆弾投下インターバル
+        self.pattern = "fan"  # 爆弾の広がり方（SPREADSに登録した名前）
+        self.on_stop = None  # 停止したときに呼ぶ関数（爆弾投下の予約用）
+        self.next_fire = -1  # 次に爆弾を投下するtick（-1なら未予約，EnemyGroupを参照）
 
     def update(self):
         """
@@ -338,47 +1912,53 @@ class Enemy(pg.sprite.Sprite):
         """
         if self.rect.centery > self.bound:
             self.vy = 0
-            self.state = "stop"
+            if self.state != "stop":
+                self.state = "stop"
+                if self.on_stop is not None:
+                    self.on_stop(self)
         self.rect.move_ip(self.vx, self.vy)
 
 
 class NeoBeam:
-    def __init__(self, bird: Bird, num: int):
+    def __init__(self, bird: Bird, num: int, mouse_pos: tuple[int, int] | None = None):
         self.bird = bird
         self.num = num
+        self.mouse_pos = mouse_pos
 
     def gen_beams(self) -> list[Beam]:
-        step = 100 // (self.num - 1)
-        angles = range(-50, 51, step)
-        return [Beam(self.bird, angle) for angle in angles]
+        return Beam.volley(self.bird, SPREADS["fan"](self.num), self.mouse_pos)
     
 
 class BombProjectile:
     """
     敵が発射する爆弾に関するクラス
     """
-    def __init__(self, emy: "Enemy", bird: "Bird", b_count: int, b_speed: int):
+    def __init__(self, emy: "Enemy", bird: "Bird", b_count: int, b_speed: int,
+                 pattern: str = "fan", step: int = 0, **opts):
         """ 
         引数1 emy: Enemyクラスの引数
         引数2 bird: Birdクラスの引数
         引数3 b_count: 発射する爆弾の数
         引数4 b_speed: 爆弾の速度
+        引数5 pattern: 広がり方（SPREADSに登録した名前）
+        引数6 step: 何回目の射撃か（渦巻きなどで使う）
+        その他のキーワード引数は広がり方の関数に渡す
         """
         self.emy = emy   # Enemyクラスの引数
         self.bird = bird   # Birdクラスの引数
         self.b_count = b_count
         self.b_speed = b_speed
+        self.pattern = pattern
+        self.step = step
+        self.opts = opts
 
     def gen_bombs(self) -> list[Bomb]:
         """
         指定された数の爆弾を生成し、リストとして返す
         戻り値: 複数のBombインスタンスを格納したリストlist[Bomb]
         """
-        step = 100 // (self.b_count - 1)  # 爆弾間の角度差
-        angles = range(-50, 51, step)  # 爆弾の角度範囲
-        # 爆弾を生成し、リストに追加
-        bombs = [Bomb(self.emy, self.bird, self.b_speed, angle) for angle in angles]
-        return bombs
+        offsets = SPREADS[self.pattern](self.b_count, self.step, **self.opts)  # 爆弾の角度
+        return Bomb.volley(self.emy, self.bird, self.b_speed, offsets)
     
 
 class Gravity(pg.sprite.Sprite):
@@ -393,22 +1973,16 @@ class Gravity(pg.sprite.Sprite):
         """
         super().__init__()
         self.life = life  # 発動時間を設定, 以後update()にて減算
-        self.image = pg.Surface((WIDTH, HEIGHT))
-        pg.draw.rect(self.image, (0, 0, 0), pg.Rect(0, 0, WIDTH, HEIGHT))  # 黒色を設定
-        self.image.set_alpha(50)  # 透明度50
+        self.image = OVERLAYS.get((0, 0, 0), 50)  # 黒色・透明度50（全Gravityで共有）
         self.rect = self.image.get_rect()
 
 
-    def update(self, screen: pg.Surface):
+    def schedule(self, sched: Scheduler):
         """
-        lifeを呼び出し毎に減算
-        screenへの反映
+        発動時間の終わりに消滅するよう予約する
+        （screenへの反映はGame.draw()で行う）
         """
-        if self.life < 0:
-            # print(self.life)
-            self.kill()
-        self.life -= 1  # lifeの減算
-        screen.blit(self.image, self.rect)  # screenに反映
+        sched.call_later(self.life + 2, self.kill)
 
 
 class Score:
@@ -418,55 +1992,81 @@ class Score:
     敵機：10点
     """
     def __init__(self):
-        self.font = pg.font.Font(None, 50)
         self.color = (0, 0, 255)
         self.value = 0
-        self.image = self.font.render(f"Score: {self.value}", 0, self.color)
-        self.rect = self.image.get_rect()
-        self.rect.center = 100, HEIGHT-50
+        self.shown = None  # 最後に描画したスコア
+        self.image = None
+        self.rect = None
 
-    def update(self, screen: pg.Surface):
-        self.image = self.font.render(f"Score: {self.value}", 0, self.color)
-        screen.blit(self.image, self.rect)
+    def update(self, screen: pg.Surface) -> pg.Rect:
+        if self.shown != self.value:  # スコアが変わったときだけ描画し直す
+            self.shown = self.value
+            self.image = TEXT.render(f"Score: {self.value}", 50, self.color, name=None, antialias=False)
+            self.rect = self.image.get_rect()
+            self.rect.center = 100, HEIGHT-50
+        return screen.blit(self.image, self.rect)
 
 
 class EMP:
-    def __init__(self, enemies, bombs, screen):
+    def __init__(self, enemies, bombs, screen, on_resume=None):
+        """
+        引数4 on_resume：無効化を解除した敵機ごとに呼ぶ関数（爆弾投下の再予約用）
+        """
         self.enemies = enemies
         self.bombs = bombs
         self.screen = screen
+        self.on_resume = on_resume
         self.active = False
         self.timer = 0
+        self.flash = False  # このフレームに黄色の閃光を重ねるか
 
     def activate(self):
         self.active = True
         for enemy in self.enemies:
             enemy.interval = float('inf')
             enemy.image = pg.transform.laplacian(enemy.image)
+        if isinstance(self.enemies, EnemyGroup):
+            self.enemies.refresh()
         for bomb in self.bombs:
             bomb.speed //= 2
             bomb.state = "inactive"
+        if isinstance(self.bombs, ProjectileGroup):
+            self.bombs.refresh()
 
     def deactivate(self):
         self.active = False
         for enemy in self.enemies:
             enemy.interval = random.randint(50, 300)
             # 元の画像に戻す処理が必要な場合はここで行う
+            if self.on_resume is not None:
+                self.on_resume(enemy)
+        if isinstance(self.enemies, EnemyGroup):
+            self.enemies.refresh()
         for bomb in self.bombs:
             bomb.speed *= 2
+        if isinstance(self.bombs, ProjectileGroup):
+            self.bombs.refresh()
 
     def update(self):
+        """
+        有効な間，5フレームに1回閃光を出す
+        """
+        self.flash = False
         if self.active:
             self.timer += 1
             if self.timer % 5 == 0:
-                # 画面全体に透明度のある黄色矩形を描画
-                surface = pg.Surface(self.screen.get_size(), pg.SRCALPHA)
-                surface.fill((255, 255, 0, 128))  # 黄色で、透明度128
-                self.screen.blit(surface, (0, 0))
-                # 他のオブジェクトを描画するコードの後に配置
-
+                self.flash = True
                 self.timer = 0  # タイマーをリセット
 
+    def draw(self, screen: pg.Surface) -> pg.Rect | None:
+        """
+        閃光のフレームなら画面全体に透明度のある黄色矩形を重ねる（他のオブジェクトを描画した後に呼ぶ）
+        戻り値：描画した範囲（描かなければNone）
+        """
+        if not self.flash:
+            return None
+        return OVERLAYS.blit(screen, (255, 255, 0), 128, precomposed=True)  # 黄色で、透明度128
+
 class Shield(pg.sprite.Sprite):
     """
     防御壁に関するクラス
@@ -480,7 +2080,7 @@ class Shield(pg.sprite.Sprite):
         super().__init__()
         width, height = 20, bird.rect.height * 2
         width, height = 20, bird.rect.width * 2
-        self.image = pg.Surface((width, height))
+        self.image = pg.Surface((width, height), pg.SRCALPHA)  # 回転したときの角を透明にする
         self.image.fill((0, 0, 255))  # 青色
         self.rect = self.image.get_rect()
         # こうかとんの向きに基づいて防御壁を配置
@@ -492,13 +2092,11 @@ class Shield(pg.sprite.Sprite):
         self.rect.centery = bird.rect.centery + bird.rect.height * self.vy
         self.life = life
 
-    def update(self):
+    def schedule(self, sched: Scheduler):
         """
-        防御壁の有効時間を管理
+        防御壁の有効時間の終わりに消滅するよう予約する（life tickの間は衝突判定に残る）
         """
-        self.life -= 1
-        if self.life < 0:
-            self.kill()
+        sched.call_later(self.life + 1, self.kill)
 
 
 class Boss(pg.sprite.Sprite):
@@ -507,59 +2105,101 @@ class Boss(pg.sprite.Sprite):
     """
     def __init__(self, health: int):
         super().__init__()
-        self.image = pg.transform.rotozoom(pg.image.load("fig/boss.png"), 0, 1.2)
+        self.image = pg.transform.rotozoom(ASSETS.load("fig/boss.png"), 0, 1.2)
         self.rect = self.image.get_rect(center=(WIDTH // 2, HEIGHT // 4))
         self.health = health  # ボスの耐久値
         self.health = health # ボスの耐久値
         self.speed = 2  # 移動速度
         self.direction = 1  # 移動方向 (左右)
         self.attack_interval = 30  # 攻撃間隔（フレーム数）※更に短くする
-        self.timer = 0  # 攻撃タイマー
+        self.timer = None  # 攻撃のTimer
+        self.pattern = "fan"  # 攻撃の広がり方（SPREADSに登録した名前）
+        self.pattern_opts = {"width": 60}  # 広がり方の関数に渡す引数
+        self.shots = 0  # 攻撃した回数
 
-    def update(self, bombs: pg.sprite.Group, bird: Bird):
+    def update(self):
         """
-        Bossの移動と攻撃処理
+        Bossの移動処理
         """
         # 左右に移動
         self.rect.x += self.speed * self.direction
         if self.rect.left < 0 or self.rect.right > WIDTH:
             self.direction *= -1
 
-        # 攻撃処理
-        self.timer += 1
-        if self.timer >= self.attack_interval:
-            self.shoot(bombs, bird)
-            self.timer = 0  # タイマーをリセット
+    def schedule(self, sched: Scheduler, bombs: pg.sprite.Group, bird: Bird):
+        """
+        attack_intervalごとの攻撃を予約する
+        """
+        self.timer = sched.call_every(self.attack_interval, self.shoot, bombs, bird)
+
+    def kill(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        super().kill()
 
     def shoot(self, bombs: pg.sprite.Group, bird: Bird):
         """
         Bossが多方向に高速爆弾を発射する
         """
-        angles = [-30, -15, 0, 15, 30]  # 多方向に発射する角度
-        for angle in angles:
-            bombs.add(BossBomb(self.rect.center, bird, angle, speed=15))  # 更に速い速度
+        angles = SPREADS[self.pattern](5, self.shots, **self.pattern_opts)  # 多方向に発射する角度
+        self.shots += 1
+        volley = BossBomb.volley(self.rect.center, bird, angles, speed=15)  # 更に速い速度
+        if isinstance(bombs, ProjectileGroup):
+            bombs.extend(volley)
+        else:
+            bombs.add(*volley)
 
 
-class BossBomb(pg.sprite.Sprite):
+class BossBomb(PooledSprite):
     """
     Boss専用の爆弾クラス（多方向攻撃）
     """
+    img = None  # 全BossBombで共有する爆弾円の画像
+
+    @classmethod
+    def shared_img(cls) -> pg.Surface:
+        """
+        全BossBombで共有する爆弾円の画像を返す（初回だけ描画する）
+        """
+        if cls.img is None:
+            rad = 20  # 爆弾円の半径
+            cls.img = pg.Surface((2 * rad, 2 * rad), pg.SRCALPHA)
+            pg.draw.circle(cls.img, (255, 0, 0), (rad, rad), rad)
+        return cls.img
+
     def __init__(self, center: tuple, bird: Bird, angle: float, speed: float):
         super().__init__()
         self.state = "active"
-        rad = 20  # 爆弾円の半径
-        self.image = pg.Surface((2 * rad, 2 * rad), pg.SRCALPHA)
-        pg.draw.circle(self.image, (255, 0, 0), (rad, rad), rad)
+        self.image = __class__.shared_img()
         self.rect = self.image.get_rect(center=center)
 
         # 方向ベクトルを計算（angle分だけずらす）
         base_angle = math.atan2(bird.rect.centery - center[1], bird.rect.centerx - center[0])
         adjusted_angle = base_angle + math.radians(angle)
-        self.vx = math.cos(adjusted_angle) * speed
-        self.vy = math.sin(adjusted_angle) * speed
+        self.vx = math.cos(adjusted_angle)
+        self.vy = math.sin(adjusted_angle)
+        self.speed = speed  # EMPで半減する
+
+    @classmethod
+    def volley(cls, center: tuple, bird: Bird, offsets: list[float], speed: float) -> list["BossBomb"]:
+        """
+        こうかとんへの方向からoffsets（度）だけずらした爆弾をまとめて生成する
+        """
+        img = cls.shared_img()
+        base = math.degrees(math.atan2(bird.rect.centery - center[1], bird.rect.centerx - center[0]))
+        bombs = []
+        for c, s in zip(*spread_vectors(base, offsets)[1:]):
+            bomb = cls.blank()
+            bomb.state = "active"
+            bomb.image = img
+            bomb.rect = img.get_rect(center=center)
+            bomb.vx, bomb.vy = c, s
+            bomb.speed = speed
+            bombs.append(bomb)
+        return bombs
 
     def update(self):
-        self.rect.move_ip(self.vx, self.vy)
+        self.rect.move_ip(self.speed * self.vx, self.speed * self.vy)
         if check_bound(self.rect) != (True, True):
             self.kill()
 
@@ -570,12 +2210,12 @@ class StartScreen:
     """
     def __init__(self, screen):
         self.screen = screen
-        self.font = pg.font.Font("C:/Windows/Fonts/msgothic.ttc", 80)  # 日本語フォント
+        self.font = FONTS.get(80)  # 日本語フォント
         self.text = self.font.render("Sキーを押してゲーム開始！", True, (255, 0, 0))
         self.rect = self.text.get_rect(center=(WIDTH//2, HEIGHT//2))
 
         # タイトル表示
-        self.title_font = pg.font.Font("C:/Windows/Fonts/msgothic.ttc", 100)  # タイトルのフォント
+        self.title_font = FONTS.get(100)  # タイトルのフォント
         self.title_text = self.title_font.render("真！真！無双こうかとん", True, (255, 255, 0)) # タイ
         self.title_rect = self.title_text.get_rect(center=(WIDTH//2, HEIGHT//4))
 
@@ -585,7 +2225,29 @@ class StartScreen:
         self.exit_text = self.font.render("Xキーを押したら終了", True, (128, 0, 128))  # 紫文字
         self.exit_rect = self.exit_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 200))
 
-        self.bg_img = pg.image.load("fig/6.png")  # スタート画面の背景画像
+        self.bg_img = ASSETS.load("fig/6.png")  # スタート画面の背景画像
+
+    def preload(self) -> dict:
+        """
+        進み具合のバーを表示しながら画像をまとめて読み込み，起動時間を表示する
+        戻り値：preload_assets()の結果に，起動からタイトル画面までの時間"startup_ms"を加えた辞書
+        """
+        bar = pg.Rect(0, 0, WIDTH // 2, 24)
+        bar.center = (WIDTH // 2, HEIGHT * 3 // 4)
+
+        def progress(done: int, total: int):
+            self.screen.fill((0, 0, 0))
+            self.screen.blit(self.bg_img, [0, 0])
+            self.screen.blit(self.title_text, self.title_rect)
+            pg.draw.rect(self.screen, (255, 255, 255), bar, 2)
+            pg.draw.rect(self.screen, (255, 255, 0), (bar.x, bar.y, bar.width * done // total, bar.height))
+            pg.display.update(bar.union(self.title_rect))
+            pg.event.pump()  # 読み込み中も応答なしにならないように
+
+        report = preload_assets(progress=progress)
+        report["startup_ms"] = (time.perf_counter() - START_TIME) * 1000
+        print(f"起動（{report['mode']}）：タイトル画面まで{report['startup_ms']:.0f}ms（画像{report['files']}枚 {report['ms']:.0f}ms）")
+        return report
 
     def display(self):
         """
@@ -599,16 +2261,113 @@ class StartScreen:
         pg.display.update()   # 画面を更新
 
 
+class Difficulty:
+    """
+    難易度を決めるパラメータをまとめたクラス（調整用のスイープ（sweep.py）から差し替えられる）
+    """
+    def __init__(self, volley_scores: tuple[int, int] = (50, 100),
+                 small_volley: tuple[int, int] = (3, 8), large_volley: tuple[int, int] = (5, 10),
+                 boss_health: int = 30, boss_attack_interval: int = 30, clear_kills: int = 15):
+        """
+        引数1 volley_scores：敵機の爆弾が3方向，5方向に増えるスコア
+        引数2 small_volley：3方向のときの(爆弾の数, 速度)
+        引数3 large_volley：5方向のときの(爆弾の数, 速度)
+        引数4 boss_health：ボスの耐久値
+        引数5 boss_attack_interval：ボスの攻撃間隔（フレーム数）
+        引数6 clear_kills：ステージ1のクリアに必要な撃破数
+        """
+        self.volley_scores = tuple(volley_scores)
+        self.small_volley = tuple(small_volley)
+        self.large_volley = tuple(large_volley)
+        self.boss_health = boss_health
+        self.boss_attack_interval = boss_attack_interval
+        self.clear_kills = clear_kills
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+DEFAULT_DIFFICULTY = Difficulty()
+
+
+class Stage:
+    """
+    ステージ定義ファイルの1ステージ分を，tickから出現するもののリストを引ける形に変換したクラス
+    waveは{"spawn": 種類, "at": tick}（一度だけ）か{"spawn": 種類, "every": 周期, "start": 開始tick, "until": 終了tick}（繰り返し）
+    tickはステージ開始からの経過フレーム数
+    """
+    SPAWNS = ("enemy", "boss")  # 出現させられるものの種類
+    CLEARS = ("kills", "boss")  # クリア条件の種類
+
+    def __init__(self, spec: dict):
+        """
+        引数 spec：ステージ定義の辞書
+        """
+        self.name = spec.get("name", "")
+        self.clear = spec.get("clear", "kills")  # "kills"：規定数の撃破，"boss"：ボスの撃破
+        self.kills = spec.get("kills")  # クリアに必要な撃破数（Noneなら難易度の値）
+        self.background = spec.get("background")  # 背景の層のリスト（Noneなら既定の背景，Backgroundを参照）
+        if any("image" not in layer for layer in self.background or []):
+            raise ValueError(f"{self.name}：backgroundの層には\"image\"が必要")
+        if self.clear not in __class__.CLEARS:
+            raise ValueError(f"{self.name}：clearは{__class__.CLEARS}のいずれか")
+        self.once: dict[int, list[dict]] = {}  # tick→一度だけのwave
+        self.periodic: dict[int, dict[int, list[dict]]] = {}  # 周期→(tick % 周期)→繰り返しのwave
+        for wave in spec.get("waves", []):
+            if wave.get("spawn") not in __class__.SPAWNS:
+                raise ValueError(f"{self.name}：spawnは{__class__.SPAWNS}のいずれか（{wave}）")
+            if "every" in wave:
+                every = wave["every"]
+                if every <= 0:
+                    raise ValueError(f"{self.name}：everyは正の整数（{wave}）")
+                phases = self.periodic.setdefault(every, {})
+                phases.setdefault(wave.get("start", 0) % every, []).append(wave)
+            else:
+                self.once.setdefault(wave.get("at", 0), []).append(wave)
+
+    def spawns(self, t: int) -> list[dict]:
+        """
+        ステージ開始からtフレーム目に出現させるwaveのリストを返す
+        （周期の種類ごとに辞書を1回引くだけで，wave全体は見ない）
+        """
+        found = self.once.get(t, [])
+        for every, phases in self.periodic.items():
+            waves = phases.get(t % every)
+            if waves:
+                found = found + [w for w in waves if w.get("start", 0) <= t < w.get("until", t + 1)]
+        return found
+
+
+STAGES_FILE = "stages.json"  # ステージ定義ファイル（--stagesで差し替えられる）
+_stages_cache: dict[str, list[Stage]] = {}
+
+
+def load_stages(path: str | None = None) -> list[Stage]:
+    """
+    ステージ定義ファイル（JSON）を読み込み，Stageのリストを返す（同じファイルは1回だけ読む）
+    引数 path：ステージ定義ファイル（NoneならSTAGES_FILE）
+    """
+    path = path or STAGES_FILE
+    if path not in _stages_cache:
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+        _stages_cache[path] = [Stage(stage) for stage in spec["stages"]]
+    return _stages_cache[path]
+
+
 class StageManager:
     """
     ステージ進行を管理するクラス
     """
-    def __init__(self, bird: Bird, score: Score):
+    def __init__(self, bird: Bird, score: Score, difficulty: Difficulty = DEFAULT_DIFFICULTY,
+                 stages: list[Stage] | None = None):
         self.stage = 1  # 現在のステージ
+        self.stages = load_stages() if stages is None else stages  # ステージ定義
         self.bird = bird
         self.score = score
+        self.difficulty = difficulty
+        self.kill_base = 0  # 現在のステージが始まったときの撃破数
         self.enemy_kill_count = 0  # 倒した敵の数
-        self.font = pg.font.Font(None, 50)
         self.neobeam_ready = False  # NeoBeamの使用可能状態
         self.neobeam_uses = 0  # NeoBeam使用可能数
         self.enemy_kill_for_neobeam = 0
@@ -619,85 +2378,89 @@ class StageManager:
         self.enemy_kill_for_neobeam = 0  # カウントをリセット
         self.neobeam_uses = 3  # NeoBeamの回数をリセット
 
-    def display_neobeam_status(self, screen: pg.Surface):
-        """NeoBeamの状態を画面に表示"""
-        stage_font = pg.font.Font("C:/Windows/Fonts/msgothic.ttc", 30)  # 日本語フォント
+    def display_neobeam_status(self, screen: pg.Surface) -> pg.Rect:
+        """NeoBeamの状態を画面に表示し，描画した範囲を返す"""
         if self.neobeam_ready:
             neo_beams = self.neobeam_uses
-            neobeam_text = stage_font.render(f"NeoBeam: 使用可能(残り{neo_beams}回)", True, (0, 255, 0))  # 緑色で描画
+            neobeam_text = TEXT.render(f"NeoBeam: 使用可能(残り{neo_beams}回)", 30, (0, 255, 0))  # 緑色で描画
         else:
             remaining = max(0, 3 - self.enemy_kill_for_neobeam)
-            neobeam_text = stage_font.render(f"NeoBeam: {remaining}体撃破で使用可能", True, (255, 0, 0))  # 赤色
+            neobeam_text = TEXT.render(f"NeoBeam: {remaining}体撃破で使用可能", 30, (255, 0, 0))  # 赤色
         # テキストの位置を設定（画面左上に表示）
         stage_rect = neobeam_text.get_rect(topleft=(50, 20))
-        screen.blit(neobeam_text, stage_rect)  # テキストを描画
-
-    def check_stage_clear(self, screen, emys):
-        """ステージ 1 のクリア条件を満たしたか確認"""
-        if self.stage == 1 and self.enemy_kill_count >= 15:
-            self.display_stage_clear(screen)
-            emys.empty()  # ステージ1の敵をすべて消去
+        return screen.blit(neobeam_text, stage_rect)  # テキストを描画
+
+    @property
+    def current(self) -> Stage:
+        """現在のステージの定義"""
+        return self.stages[min(self.stage, len(self.stages)) - 1]
+
+    def clear_kills(self) -> int:
+        """現在のステージのクリアに必要な撃破数"""
+        kills = self.current.kills
+        return self.difficulty.clear_kills if kills is None else kills
+
+    def stage_cleared(self, bosses) -> bool:
+        """現在のステージのクリア条件（規定数の撃破，またはボスの撃破）を満たしたか"""
+        if self.current.clear == "boss":
+            return len(bosses) > 0 and all(boss.health <= 0 for boss in bosses)
+        return self.enemy_kill_count - self.kill_base >= self.clear_kills()
+
+    def check_stage_clear(self, emys, bosses=()):
+        """最後以外のステージのクリア条件を満たしたか確認し，次のステージに進む（表示はBannerSceneで行う）"""
+        if self.stage < len(self.stages) and self.stage_cleared(bosses):
+            emys.empty()  # ステージの敵をすべて消去
+            for boss in list(bosses):
+                boss.kill()
             self.stage += 1
-            time.sleep(2) 
+            self.kill_base = self.enemy_kill_count
             return True
         return False
         
-    def display_stage_clear(self, screen):
-        """ステージクリアメッセージを表示"""
-        font = pg.font.Font("C:/Windows/Fonts/msgothic.ttc", 80)  # 日本語フォント
-        text = font.render(f"ステージ {self.stage} クリア！", True, (0, 255, 0))
+    def display_stage_clear(self, screen, stage: int):
+        """ステージstageのクリアメッセージを描画"""
+        font = FONTS.get(80)  # 日本語フォント
+        text = font.render(f"ステージ {stage} クリア！", True, (0, 255, 0))
         rect = text.get_rect(center=(WIDTH // 2, HEIGHT // 2))
         screen.blit(text, rect)
-        pg.display.update()
 
-    def check_game_clear(self, screen, b_health):
-        """ゲームクリア条件 (ボスを倒したか) を確認"""
-        if self.stage == 2 and b_health == 0:  # ボスが倒されたら
-            self.display_game_clear(screen)
-            time.sleep(3) # ゲームクリア後に静止
-            return True
-        return False
+    def check_game_clear(self, bosses):
+        """ゲームクリア条件 (最後のステージをクリアしたか) を確認"""
+        return self.stage >= len(self.stages) and self.stage_cleared(bosses)  # ボスが倒されたら
         
     def display_game_clear(self, screen):
-        """ゲームクリアメッセージを表示"""
-        black_overlay = pg.Surface((WIDTH, HEIGHT))
-        black_overlay.set_alpha(128)  # 半透明設定
-        black_overlay.fill((0, 0, 0))  # 黒色
-        screen.blit(black_overlay, (0, 0))  # 背景を描画
+        """ゲームクリアメッセージを描画"""
+        OVERLAYS.blit(screen, (0, 0, 0), 128)  # 半透明の黒背景を描画
 
-        font = pg.font.Font("C:/Windows/Fonts/msgothic.ttc", 80)  # 日本語フォント
+        font = FONTS.get(80)  # 日本語フォント
         text = font.render("ゲームクリア！", True, (255, 255, 0))
         rect = text.get_rect(center=(WIDTH // 2, HEIGHT // 2))
 
         # 両端に喜んでいるこうかとん画像を配置
-        img_left = pg.image.load("fig/6.png")
-        img_right = pg.transform.flip(img_left, True, False)
+        img_left = ASSETS.load("fig/6.png")
+        img_right = ASSETS.flipped("fig/6.png", True, False)
         left_rect = img_left.get_rect(midright=(rect.left - 20, HEIGHT // 2))
         right_rect = img_right.get_rect(midleft=(rect.right + 20, HEIGHT // 2))
 
         screen.blit(text, rect)
         screen.blit(img_left, left_rect)
         screen.blit(img_right, right_rect)
-        pg.display.update()
 
-    def gameover(self, screen: pg.Surface):
+    def display_gameover(self, screen: pg.Surface):
         """
-        ゲームオーバー画面を表示し、赤背景とテキストを描画する。
+        ゲームオーバー画面の赤背景とテキストを描画する。
         """
         # 半透明の赤背景
-        red_overlay = pg.Surface((WIDTH, HEIGHT))
-        red_overlay.set_alpha(128)  # 半透明設定
-        red_overlay.fill((255, 0, 0))  # 赤色
-        screen.blit(red_overlay, (0, 0))  # 背景描画
+        OVERLAYS.blit(screen, (255, 0, 0), 128)  # 背景描画
 
         # テキスト表示
-        font = pg.font.Font("C:/Windows/Fonts/msgothic.ttc", 80)  # 日本語フォント
+        font = FONTS.get(80)  # 日本語フォント
         text = font.render("ゲームオーバー！", True, (255, 255, 255)) # 白文字
         rect = text.get_rect(center=(WIDTH // 2, HEIGHT // 2))
         screen.blit(text, rect)
 
         # 泣いているこうかとん画像を表示
-        img = pg.image.load("fig/8.png")  # 泣いているこうかとん
+        img = ASSETS.load("fig/8.png")  # 泣いているこうかとん
         img_rect = img.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 150))
         screen.blit(img, img_rect)
         # Bキーの説明
@@ -705,72 +2468,791 @@ class StageManager:
         sub_rect = sub_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 100))  # 文字間隔を調整
         screen.blit(sub_text, sub_rect)
 
-        pg.display.update()
-
-        while True:
-            for event in pg.event.get():
-                if event.type == pg.KEYDOWN and event.key == pg.K_b:  # Bキーでタイトル画面に戻る
-                    screen.fill((0, 0, 0))  # 画面をクリア
-                    return
-
-    def display_stage(self, screen):
-        """右上にステージ進行状況を表示"""
-        stage_font = pg.font.Font("C:/Windows/Fonts/msgothic.ttc", 30)
+    def display_stage(self, screen) -> list[pg.Rect]:
+        """右上にステージ進行状況を表示し，描画した範囲のリストを返す"""
         # ステージ数の表示 (右下)
-        stage_text = stage_font.render(f"ステージ: {self.stage}", True, (255, 0, 0))
+        stage_text = TEXT.render(f"ステージ: {self.stage}", 30, (255, 0, 0))
         stage_rect = stage_text.get_rect(bottomright=(WIDTH - 20, HEIGHT - 20))
-        screen.blit(stage_text, stage_rect)
+        drawn = [screen.blit(stage_text, stage_rect)]
 
         # 敵の残数表示 (右上)
-        if self.stage == 1:
-            # 敵機の画像を読み込む
-            enemy_image = pg.image.load("fig/alien1.png")
-            enemy_image = pg.transform.scale(enemy_image, (20, 20))
+        if self.current.clear == "kills":
+            # 敵機の画像（縮小済み）
+            enemy_image = ASSETS.scaled("fig/alien1.png", (20, 20))
 
             # テキストのレンダリング
-            remaining_text = stage_font.render(f"残り:", True, (255, 255, 255))
+            remaining_text = TEXT.render("残り:", 30, (255, 255, 255))
             remaining_rect = remaining_text.get_rect(topright=(WIDTH - 100, 20))
 
             # 画像の表示位置
             enemy_rect = enemy_image.get_rect(topright=(remaining_rect.left - 10, 20))  # テキストの左
 
             # 画像とテキストの描画
-            screen.blit(enemy_image, enemy_rect)
-            screen.blit(remaining_text, remaining_rect)
+            drawn.append(screen.blit(enemy_image, enemy_rect))
+            drawn.append(screen.blit(remaining_text, remaining_rect))
 
             # 数字の描画
-            number_text = stage_font.render(f"{15 - self.enemy_kill_count}", True, (255, 255, 255))
+            number_text = TEXT.render(f"{self.clear_kills() - (self.enemy_kill_count - self.kill_base)}", 30, (255, 255, 255))
             number_rect = number_text.get_rect(topleft=(remaining_rect.right, 20))
-            screen.blit(number_text, number_rect)
+            drawn.append(screen.blit(number_text, number_rect))
 
-        else: # ステージ2
-            # ボスの画像を読み込む
-            boss_image = pg.image.load("fig/boss.png")
-            boss_image = pg.transform.scale(boss_image, (30, 30))
-            boss_text = stage_font.render("ボス", True, (255, 255, 255))
+        else: # ボスのステージ
+            # ボスの画像（縮小済み）
+            boss_image = ASSETS.scaled("fig/boss.png", (30, 30))
+            boss_text = TEXT.render("ボス", 30, (255, 255, 255))
             boss_rect = boss_text.get_rect(topright=(WIDTH - 100, 20))
-            screen.blit(boss_text, boss_rect)
-            screen.blit(boss_image, boss_rect.topright)
-
-
-def wait_for_start(screen):
-    start_screen = StartScreen(screen)
-    while True:
-        start_screen.display()  # タイトル画面を表示
-        for event in pg.event.get():
-            if event.type == pg.QUIT:
-                return False
-            if event.type == pg.KEYDOWN:
-                if event.key == pg.K_s:  # Sキーでゲーム開始
-                    return True
-                if event.key == pg.K_i:  # Iキーで操作説明画面に切り替え
-                    screen.fill((0, 0, 0))  # 画面を黒で塗りつぶす
-                    show_instructions(screen)  # 操作説明を表示
-                    screen.fill((0, 0, 0))  # 操作説明後に画面を再度黒で塗りつぶし
-                    start_screen.display()  # タイトル画面を再表示
-                if event.key == pg.K_x:  # Xキーでゲーム終了
-                    pg.quit()
-                    sys.exit()
+            drawn.append(screen.blit(boss_text, boss_rect))
+            drawn.append(screen.blit(boss_image, boss_rect.topright))
+        return drawn
+
+
+class FrameProfiler:
+    """
+    1フレーム内の区間ごとの処理時間を計測するクラス
+    mark(名前)を呼ぶと，前のmarkからの時間を前の区間に加算する
+    直近のフレームを積み上げグラフで画面に表示し，Chromeのトレース形式(JSON)で書き出せる
+    """
+    COLORS = {  # 区間名の先頭（:より前）ごとのグラフの色
+        "events": (160, 160, 160),
+        "input": (255, 255, 255),
+        "spawn": (255, 128, 0),
+        "collide": (255, 0, 0),
+        "update": (0, 200, 255),
+        "draw": (0, 255, 0),
+        "hud": (255, 255, 0),
+        "display.update": (255, 0, 255),
+        "profiler": (80, 80, 80),
+    }
+
+    def __init__(self, budget_ms: float = 20, history: int = 150, max_events: int = 200000):
+        """
+        引数1 budget_ms：1フレームの予算（ミリ秒，clock.tick(50)なら20）
+        引数2 history：グラフに表示するフレーム数
+        引数3 max_events：トレースに保存する区間の上限数
+        """
+        self.enabled = False
+        self.budget_ms = budget_ms
+        self.history: deque[dict[str, float]] = deque(maxlen=history)
+        self.events: deque[tuple[str, float, float]] = deque(maxlen=max_events)  # (区間名, 開始, 長さ)
+        self.origin = time.perf_counter()
+        self.label = None
+        self.start = 0.0
+        self.frame: dict[str, float] = {}
+        self.graph = None  # グラフを描き足していくSurface
+        self.drawn = None  # グラフに描いた最後のフレーム
+        self.lines: list[pg.Surface] = []  # 区間ごとの時間の文字
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.label = None
+
+    def begin_frame(self):
+        """
+        フレームの計測を始める
+        """
+        if not self.enabled:
+            return
+        self.frame = {}
+        self.label = "events"
+        self.start = time.perf_counter()
+
+    def mark(self, label: str):
+        """
+        前の区間を閉じ，labelの区間を始める
+        """
+        if self.label is None:
+            return
+        now = time.perf_counter()
+        dur = now - self.start
+        self.frame[self.label] = self.frame.get(self.label, 0.0) + dur * 1000
+        self.events.append((self.label, self.start, dur))
+        self.label = label
+        self.start = now
+
+    def end_frame(self):
+        """
+        最後の区間を閉じ，フレームの結果を履歴に追加する
+        """
+        if self.label is None:
+            return
+        self.mark(None)
+        self.history.append(self.frame)
+
+    def draw(self, screen: pg.Surface):
+        """
+        直近のフレーム時間を区間ごとに色分けした積み上げグラフを描画する
+        グラフは1フレームごとに左へスクロールし，新しい1列だけを描き足す
+        """
+        if not self.enabled:
+            return
+        self.mark("profiler")
+        scale = 4  # 1ミリ秒あたりのピクセル数
+        height = int(self.budget_ms * scale * 2)
+        width = self.history.maxlen * 2
+        if self.graph is None:
+            self.graph = pg.Surface((width, height))
+            self.graph.set_colorkey((0, 0, 0))
+        if self.history and self.history[-1] is not self.drawn:
+            self.drawn = frame = self.history[-1]
+            self.graph.scroll(-2, 0)
+            self.graph.fill((0, 0, 0), (width - 2, 0, 2, height))
+            y = height
+            for label, ms in frame.items():
+                h = ms * scale
+                color = __class__.COLORS.get(label.split(":")[0], (200, 200, 200))
+                self.graph.fill(color, (width - 2, y - h, 2, h + 1))
+                y -= h
+            if len(self.history) % 10 == 0:  # 文字は10フレームごとに更新
+                worst = sorted(frame.items(), key=lambda item: -item[1])[:6]
+                lines = [f"frame {sum(frame.values()):.2f}ms / {self.budget_ms:.0f}ms"]
+                lines += [f"{label} {ms:.2f}" for label, ms in worst]
+                font = TEXT.font(None, 20)
+                self.lines = [font.render(line, True, (255, 255, 255)) for line in lines]
+        top = HEIGHT - 90 - height
+        screen.blit(self.graph, (10, top))
+        budget_y = top + height - self.budget_ms * scale
+        pg.draw.line(screen, (255, 255, 255), (10, budget_y), (10 + width, budget_y))
+        for i, img in enumerate(self.lines):
+            screen.blit(img, (20 + width, budget_y + i * 16))
+
+    def export_trace(self, path: str):
+        """
+        保存した区間をChromeのトレースイベント形式(JSON)で書き出す
+        chrome://tracing や Perfetto で読み込める
+        """
+        events = [{"name": label, "cat": label.split(":")[0], "ph": "X", "pid": 1, "tid": 1,
+                   "ts": (start - self.origin) * 1e6, "dur": dur * 1e6}
+                  for label, start, dur in self.events]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+NULL_PROFILER = FrameProfiler()  # 無効のままのプロファイラ（Gameの既定値）
+
+
+TRACKED_KEYS = (pg.K_w, pg.K_s, pg.K_a, pg.K_d, pg.K_LSHIFT, pg.K_RSHIFT, pg.K_e, pg.K_l, pg.K_RETURN)  # ゲームで使うキー
+
+
+class InputFrame:
+    """
+    1フレーム分の入力をまとめたクラス
+    実際のキーボード・マウスからでも，スクリプトからでも同じように作れる
+    """
+    __slots__ = ("pressed", "buttons", "mouse_pos", "keydowns", "quit")
+
+    def __init__(self, pressed=(), buttons=(False, False, False), mouse_pos=(0, 0),
+                 keydowns=(), quit=False):
+        """
+        引数1 pressed：押下中のキーコード
+        引数2 buttons：マウスボタン(左, 中, 右)の押下状態
+        引数3 mouse_pos：マウスカーソルの座標
+        引数4 keydowns：このフレームで押されたキーコード（押された順）
+        引数5 quit：ウィンドウが閉じられたかどうか
+        """
+        self.pressed = frozenset(pressed)
+        self.buttons = tuple(buttons)
+        self.mouse_pos = tuple(mouse_pos)
+        self.keydowns = tuple(keydowns)
+        self.quit = quit
+
+    def __getitem__(self, key: int) -> bool:
+        """
+        pg.key.get_pressed()と同じく，キーコードで押下状態を返す
+        """
+        return key in self.pressed
+
+    @classmethod
+    def from_pygame(cls, events: list[pg.event.Event]) -> "InputFrame":
+        """
+        pygameの現在の入力状態とイベントリストからInputFrameを作る
+        """
+        key_lst = pg.key.get_pressed()
+        return cls([k for k in TRACKED_KEYS if key_lst[k]],
+                   pg.mouse.get_pressed()[:3],
+                   pg.mouse.get_pos(),
+                   [e.key for e in events if e.type == pg.KEYDOWN and e.key in TRACKED_KEYS],
+                   any(e.type == pg.QUIT for e in events))
+
+
+class Game:
+    """
+    1回分のゲーム（ステージ進行・敵や爆弾の出現・衝突判定）を描画から切り離して進めるクラス
+    step()で1フレーム分のシミュレーションを行い，draw()で画面に描画する
+    画面Surfaceが無くても（ヘッドレスで）動作する
+    """
+    def __init__(self, screen: pg.Surface | None = None, seed: int | None = None,
+                 profiler: FrameProfiler = NULL_PROFILER, interpolate: bool = False,
+                 difficulty: Difficulty = DEFAULT_DIFFICULTY, stages: list[Stage] | None = None,
+                 collision: str = "mask"):
+        """
+        引数1 screen：ステージクリアなどの演出を表示する画面Surface（Noneなら表示しない）
+        引数2 seed：乱数のシード（Noneなら初期化しない）
+        引数3 profiler：区間ごとの処理時間を計測するプロファイラ
+        引数4 interpolate：描画時に前回と今回のシミュレーション結果の間を補間するか
+        引数5 difficulty：難易度のパラメータ
+        引数6 stages：ステージ定義（Noneならstages.jsonを読む）
+        引数7 collision：こうかとん・防御壁と爆弾の衝突判定（"rect"：Rectの重なり，"mask"：画像の不透明な部分の重なり）
+        """
+        self.mask = collision == "mask"
+        self.difficulty = difficulty
+        self.profiler = profiler
+        self.interpolate = interpolate
+        self.prev_pos: dict[pg.sprite.Sprite, tuple[int, int]] = {}  # 前回のstep()開始時の位置
+        if seed is not None:
+            random.seed(seed)
+        self.screen = screen
+        self.seed = seed
+        PooledSprite.reset_pools()  # プールの利用状況はゲームごとに数える
+        self.bird = Bird(3, (900, 400))
+        self.bombs = ProjectileGroup()  # 爆弾の移動は配列でまとめて計算
+        self.beams = ProjectileGroup()
+        self.exps = EffectBatch()  # 爆発などのエフェクト
+        self.emys = EnemyGroup()
+        self.shield = pg.sprite.Group()
+        self.gra = pg.sprite.Group()
+        self.bosses = pg.sprite.Group()
+        self.emp = EMP(self.emys, self.bombs, screen, on_resume=lambda emy: self.arm_volley(emy, self.tmr))
+        self.boss_count = 0 # Boss数
+        self.score = Score()
+        self.stage_manager = StageManager(self.bird, self.score, difficulty, stages)
+        self.tmr = 0  # ゲーム内のタイマー
+        self.frames = 0  # step()を呼んだ回数
+        self.mouse_click = False
+        self.senkai = 0
+        self.collider = CollisionEngine()  # 衝突判定（空間ハッシュ）
+        self.sched = Scheduler()  # tmrを時刻とするタイマー（ボスの攻撃・効果時間）
+        self.spawn_stage = None  # 出現を管理しているステージ
+        self.stage_start = 0  # そのステージが始まったtmr
+        self.background = Background(self.stage_manager.current.background)
+        self.hyper_timer = None  # 無敵状態終了のTimer
+
+    def step(self, frame: InputFrame, lap=None) -> str | None:
+        """
+        1フレーム分ゲームを進める
+        引数1 frame：このフレームの入力
+        引数2 lap：フェーズ（"spawn"：入力と出現，"collide"，"update"）を終えるたびにその名前を渡して呼ぶ関数
+                   （ベンチマークがフェーズごとの時間を測るのに使う）
+        戻り値："quit"／"gameover"／"stage_clear"／"game_clear"，何も起きなければNone
+        """
+        self.frames += 1
+        if frame.quit:
+            return "quit"
+        if self.interpolate:
+            self.snapshot()
+        self.handle_input(frame)
+        self.spawn()
+        if lap is not None:
+            lap("spawn")
+        result = self.collide()
+        if lap is not None:
+            lap("collide")
+        if result is not None:
+            return result
+        self.update(frame)
+        self.tmr += 1
+        if lap is not None:
+            lap("update")
+        return None
+
+    def handle_input(self, frame: InputFrame):
+        """
+        マウスとキーの入力に応じてビーム，防御壁，重力場などを発動する
+        """
+        bird, score, stage_manager = self.bird, self.score, self.stage_manager
+        self.profiler.mark("input")
+        self.sched.now = self.tmr  # このフレームを基準に効果時間を予約する
+        if frame.buttons[0]:  # 左クリックがあれば条件式に入る
+            bird.change_img(3)  # こうかとんエフェクト
+            if not self.mouse_click:
+                a = Beam.acquire(bird, 0, frame.mouse_pos)
+                self.beams.add(a)
+                self.senkai = a.senkai()
+            self.mouse_click = True
+
+        elif frame.buttons[2] and stage_manager.neobeam_uses > 0:  # 右クリックでNeoBeam発射
+            bird.change_img(3)  # こうかとんエフェクト
+            if not self.mouse_click:
+                neo_beam = NeoBeam(bird, 5, frame.mouse_pos)  # NeoBeamを生成（5方向）
+                self.beams.extend(neo_beam.gen_beams())  # 複数ビームをまとめて追加
+                stage_manager.enemy_kill_for_neobeam == 0  # 使用後に0
+                stage_manager.neobeam_uses -= 1  # 使用可能回数を減少
+                if stage_manager.neobeam_uses == 0:
+                    stage_manager.neobeam_ready = False
+            self.mouse_click = True
+        else:
+            self.mouse_click = False
+
+        for key in frame.keydowns:  # 押されたキーを順に処理
+            if score.value >= 50 and key == pg.K_l:
+                shield = Shield(bird, life=400)
+                shield.schedule(self.sched)
+                self.shield.add(shield)
+                score.value -= 50  # スコア消費
+            if score.value >= 100 and key == pg.K_RETURN:  # score100以上で
+                score.value -= 100  # scoreのうち100を消費
+                gra = Gravity()
+                gra.schedule(self.sched)
+                self.gra.add(gra)
+            if key == pg.K_RSHIFT and score.value > 100:
+                bird.state = "hyper"
+                bird.hyper_life = 50
+                if self.hyper_timer is not None:  # 発動中なら終了時刻を延ばす
+                    self.hyper_timer.cancel()
+                self.hyper_timer = self.sched.call_later(bird.hyper_life + 1, bird.end_hyper)
+                score.value -= 50  # スコア消費
+            if key == pg.K_e:
+                if score.value >= 20 and not self.emp.active:
+                    score.value -= 20
+                    self.emp.activate()
+                elif self.emp.active:
+                    self.emp.deactivate()
+
+    def spawn(self):
+        """
+        ステージ定義のこのフレームの出現（敵機，ボス）と，
+        予約したタイマー（ボスの攻撃，効果時間の終了など）と敵機の爆弾投下を実行する
+        """
+        prof = self.profiler
+        if self.stage_manager.stage != self.spawn_stage:  # ステージが変わった
+            self.spawn_stage = self.stage_manager.stage
+            self.stage_start = self.tmr
+            self.boss_count = 0
+            if self.background.spec is not self.stage_manager.current.background:
+                self.background = Background(self.stage_manager.current.background)
+        prof.mark("spawn:waves")
+        for wave in self.stage_manager.current.spawns(self.tmr - self.stage_start):
+            self.spawn_wave(wave)
+        prof.mark("spawn:timers")
+        self.sched.run_until(self.tmr)
+        prof.mark("spawn:volleys")
+        self.fire_volleys()
+
+    def spawn_wave(self, wave: dict):
+        """
+        ステージ定義のwaveを1つ出現させる
+        敵機："count"体（既定1）．"max"があれば敵機がその数未満のときだけ出現し，
+              "extra_bombs"なら停止中でintervalの周期に当たる敵機が追加で爆弾を投下する
+        ボス："health"，"attack_interval"，"pattern"，"pattern_opts"で難易度の値を上書きできる
+        """
+        if wave["spawn"] == "enemy":
+            if len(self.emys) >= wave.get("max", float("inf")):  # 敵の数を制限する
+                return
+            for _ in range(wave.get("count", 1)):
+                emy = self.add_enemy()
+                emy.pattern = wave.get("pattern", emy.pattern)
+            if wave.get("extra_bombs"):
+                self.bombs.extend([Bomb.acquire(emy, self.bird, 6) for emy in self.emys.in_phase(self.tmr)])
+        elif wave["spawn"] == "boss":  # ボスの生成
+            boss = Boss(health=wave.get("health", self.difficulty.boss_health))
+            boss.attack_interval = wave.get("attack_interval", self.difficulty.boss_attack_interval)
+            boss.pattern = wave.get("pattern", boss.pattern)
+            boss.pattern_opts = wave.get("pattern_opts", boss.pattern_opts)
+            boss.schedule(self.sched, self.bombs, self.bird)
+            self.bosses.add(boss)
+            self.boss_count = 1  # Bossが生成されたことを記録
+
+    def add_enemy(self, emy: "Enemy | None" = None) -> "Enemy":
+        """
+        敵機を追加し，停止したら爆弾投下を始めるようにする
+        引数 emy：追加する敵機（Noneなら新しく生成する）
+        """
+        if emy is None:
+            emy = Enemy()
+        emy.on_stop = lambda e: self.arm_volley(e, self.tmr + 1)
+        self.emys.add(emy)
+        return emy
+
+    def arm_volley(self, emy: "Enemy", earliest: int):
+        """
+        earliest以降で最初のintervalの倍数のフレームに，敵機の爆弾投下を予約する
+        """
+        self.emys.arm(emy, earliest)
+
+    def fire_volleys(self):
+        """
+        このフレームに投下する敵機の爆弾投下（スコアに応じて弾数が増える）を行う
+        弾数はフレームごとに1回だけ決め，爆弾はまとめてbombsに加える
+        """
+        fire = self.emys.due(self.tmr)
+        if not fire:
+            return
+        bird, score, diff = self.bird, self.score, self.difficulty
+        if score.value < diff.volley_scores[0] or self.boss_count == 1:
+            self.bombs.extend([Bomb.acquire(emy, bird, 6) for emy in fire])
+            return
+        volley = diff.small_volley if score.value < diff.volley_scores[1] else diff.large_volley
+        bombs = []
+        for emy in fire:
+            bombs += BombProjectile(emy, bird, *volley, pattern=emy.pattern).gen_bombs()
+        self.bombs.extend(bombs)
+
+    def explode(self, obj: pg.sprite.Sprite, life: int, kind: str = "explosion"):
+        """
+        objの位置に爆発エフェクトを出す
+        引数3 kind：エフェクトの種類（"boom"はobjと同じ大きさの閃光，EffectSheetsを参照）
+        """
+        sheet = SHEETS.get(kind, obj.rect.width)
+        self.exps.add(sheet, obj.rect.center, self.tmr, life)
+
+    def collide(self) -> str | None:
+        """
+        衝突判定を行い，スコアやステージの状態を更新する
+        戻り値："gameover"／"stage_clear"／"game_clear"，何も起きなければNone
+        """
+        bird, score, stage_manager = self.bird, self.score, self.stage_manager
+        collider, prof = self.collider, self.profiler
+        prof.mark("collide:emys×beams")
+        for emy in collider.groupcollide(self.emys, self.beams, True, True).keys():  # ビームと衝突した敵機リスト
+            self.explode(emy, 100)  # 爆発エフェクト
+            score.value += 10  # 10点アップ
+            bird.change_img(9)  # こうかとん歌うエフェクト
+            stage_manager.enemy_kill_count += 1
+            stage_manager.enemy_kill_for_neobeam += 1  # NeoBeam用のカウントを増やす
+            if stage_manager.enemy_kill_for_neobeam >= 3:
+                stage_manager.reset_neobeam_uses()
+
+        prof.mark("collide:bombs×beams")
+        for bomb in collider.groupcollide(self.bombs, self.beams, True, True).keys():  # ビームと衝突した爆弾リスト
+            if bomb.state == "active":
+                self.explode(bomb, 50)  # 爆発エフェクト
+                bird.change_img(6)  # こうかとん喜びエフェクト
+                score.value += 1  # 1点アップ
+
+        prof.mark("collide:bombs×shield")
+        for bomb in collider.groupcollide(self.bombs, self.shield, True, True, self.mask).keys():  # 防御壁と衝突した爆弾リスト
+            if bomb.state == "active":
+                self.explode(bomb, 50)  # 爆発エフェクト
+
+        prof.mark("collide:bird×bombs")
+        for bomb in collider.spritecollide(bird, self.bombs, True, self.mask):  # こうかとんと衝突した爆弾リスト
+            if bomb.state == "active":
+                if bird.state == "hyper":  # state="hyper"なら
+                    self.explode(bomb, 20, "boom")  # 閃光エフェクト
+                    score.value += 1  # 1点アップ
+                else:  # state="hyper"ではないなら
+                    return "gameover"
+
+        prof.mark("collide:emys×gra")
+        for emy in collider.groupcollide(self.emys, self.gra, True, False).keys():  # 重力と衝突した敵機リスト
+            self.explode(emy, 100)  # 敵機の爆発エフェクト
+
+        prof.mark("collide:bombs×gra")
+        for bomb in collider.groupcollide(self.bombs, self.gra, True, False).keys():  # 重力と衝突した爆弾リスト
+            self.explode(bomb, 50)  # 爆弾の爆発エフェクト
+
+        # Bossとビームの衝突判定
+        prof.mark("collide:bosses×beams")
+        for boss in collider.groupcollide(self.bosses, self.beams, False, True).keys():
+            boss.health -= 1
+            if boss.health <= 0:
+                self.explode(boss, 200)
+
+        # ステージクリア処理
+        prof.mark("collide:clear")
+        if stage_manager.check_stage_clear(self.emys, self.bosses):
+            return "stage_clear" # ステージ遷移
+        # ゲームクリア処理
+        if stage_manager.check_game_clear(self.bosses):
+            return "game_clear"
+        # ゲームオーバー処理
+        for bomb in collider.spritecollide(bird, self.bombs, True, self.mask):
+            if bird.state != "hyper":
+                return "gameover"
+        return None
+
+    def update(self, frame: InputFrame):
+        """
+        すべてのオブジェクトを1フレーム分動かす
+        """
+        prof = self.profiler
+        prof.mark("update:bird")
+        self.bird.update(frame, self.mouse_click, self.senkai)
+        prof.mark("update:beams")
+        self.beams.update(self.bird, None)
+        prof.mark("update:emys")
+        self.emys.update()
+        prof.mark("update:bombs")
+        self.bombs.update()
+        prof.mark("update:bosses")
+        self.bosses.update()
+        prof.mark("update:exps")
+        self.exps.update(self.tmr)
+        self.emp.update()
+
+    def snapshot(self):
+        """
+        動くオブジェクトの現在位置を補間用に記録する
+        """
+        prev = {self.bird: self.bird.rect.topleft}
+        for group in (self.beams, self.bombs, self.emys, self.bosses):
+            for spr in group:
+                prev[spr] = spr.rect.topleft
+        self.prev_pos = prev
+
+    @contextmanager
+    def interpolated(self, alpha: float):
+        """
+        withの間だけ，各オブジェクトを前回と今回の位置の間（alpha：0～1）に置く
+        """
+        if not self.interpolate or alpha >= 1:
+            yield
+            return
+        moved = []
+        for spr, (px, py) in self.prev_pos.items():
+            if not spr.alive() and spr is not self.bird:
+                continue
+            x, y = spr.rect.topleft
+            if (x, y) != (px, py):
+                moved.append((spr, x, y))
+                spr.rect.topleft = (round(px + (x - px) * alpha), round(py + (y - py) * alpha))
+        try:
+            yield
+        finally:
+            for spr, x, y in moved:  # シミュレーション上の位置に戻す
+                spr.rect.topleft = (x, y)
+
+    def draw(self, screen: pg.Surface, clear: list[pg.Rect] | None = None) -> list[pg.Rect]:
+        """
+        現在の状態を画面に描画する
+        引数1 screen：画面Surface
+        引数2 clear：背景で塗り直す範囲のリスト（Noneなら背景全体を描く．背景がスクロールするときは常にNone）
+        戻り値：このフレームで描画した範囲のリスト
+        """
+        prof = self.profiler
+        prof.mark("draw:bg")
+        bg_img = self.background.surface(self.tmr - self.stage_start)
+        if clear is None:
+            screen.blit(bg_img, [0, 0])
+        else:  # 前フレームに描いた範囲だけ背景に戻す
+            screen.blits([(bg_img, rect, rect) for rect in clear], False)
+        prof.mark("draw:bird")
+        drawn = [self.bird.draw(screen)]
+        for name, group in (("beams", self.beams), ("emys", self.emys), ("bombs", self.bombs)):
+            prof.mark(f"draw:{name}")
+            drawn += screen.blits([(spr.image, spr.rect) for spr in group])
+        prof.mark("draw:exps")
+        drawn += self.exps.draw(screen, self.tmr - 1)  # 最後に進めたtickのコマ
+        prof.mark("draw:gra")
+        for _ in self.gra:  # 重力場の暗幕は乗算で重ねる
+            drawn.append(OVERLAYS.blit(screen, (0, 0, 0), 50, precomposed=True))
+        prof.mark("draw:emp")
+        flash = self.emp.draw(screen)
+        if flash is not None:
+            drawn.append(flash)
+        # booms.draw(screen)
+        prof.mark("hud:score")
+        drawn.append(self.score.update(screen))
+        for name, group in (("bosses", self.bosses), ("shield", self.shield)):
+            prof.mark(f"draw:{name}")
+            drawn += screen.blits([(spr.image, spr.rect) for spr in group])
+        prof.mark("hud:stage")
+        drawn += self.stage_manager.display_stage(screen)  # ステージ番号を右下に表示
+        drawn.append(self.stage_manager.display_neobeam_status(screen))  # NeoBeamの状態を表示
+        return drawn
+
+
+class DirtyRenderer:
+    """
+    前フレームから変わった範囲だけを描き直すクラス
+    前フレームに描いた範囲を背景で塗り直してから全オブジェクトを描き，
+    新旧の範囲だけをpg.display.updateに渡す
+    全画面を覆う演出（重力場，EMPの閃光）を描くフレームとその次のフレーム，背景がスクロールするステージ，画面遷移の直後は全画面を描き直す
+    """
+    def __init__(self, full_ratio: float = 0.5):
+        """
+        引数 full_ratio：更新範囲の面積が画面のこの割合を超えたら全画面を更新する
+        """
+        self.full_ratio = full_ratio
+        self.prev: list[pg.Rect] = []  # 前フレームに描いた範囲
+        self.full = True  # 次のフレームを全画面で描き直すかどうか
+
+    def invalidate(self):
+        """
+        次のフレームを全画面で描き直す（画面遷移やオーバーレイの後に呼ぶ）
+        """
+        self.full = True
+
+    def render(self, game: Game, screen: pg.Surface, alpha: float = 1.0) -> list[pg.Rect] | None:
+        """
+        ゲームを描画する
+        引数3 alpha：前回と今回のシミュレーション結果の間の補間係数（0～1）
+        戻り値：pg.display.updateに渡す範囲のリスト（Noneなら全画面を更新する）
+        """
+        overlay = bool(game.gra) or game.emp.flash or game.background.scrolling
+        full = self.full or overlay
+        self.full = overlay  # オーバーレイが消えた次のフレームも全画面で描き直す
+        with game.interpolated(alpha):
+            drawn = game.draw(screen, None if full else self.prev)
+        dirty = None if full else self.prev + drawn
+        self.prev = drawn
+        if dirty is not None and sum(r.w * r.h for r in dirty) > WIDTH * HEIGHT * self.full_ratio:
+            return None
+        return dirty
+
+
+class ScriptedInput:
+    """
+    あらかじめ用意した入力列を1フレームずつ返すクラス（ヘッドレス実行用）
+    """
+    def __init__(self, frames: list[InputFrame], loop: bool = False):
+        """
+        引数1 frames：フレームごとの入力
+        引数2 loop：入力列を使い切ったら最初から繰り返すかどうか
+        """
+        self.frames = frames
+        self.loop = loop
+
+    def __call__(self, game: Game) -> InputFrame:
+        i = game.frames
+        if self.loop and self.frames:
+            i %= len(self.frames)
+        if i < len(self.frames):
+            return self.frames[i]
+        return InputFrame()
+
+
+class InputRecorder:
+    """
+    シミュレーションに渡したInputFrameを小さなバイナリ形式でファイルに追記するクラス
+    形式：ファイル先頭にMAGIC，以後は1バイトの種類から始まる記録の並び
+        b"S"：ゲーム開始．乱数のシード(uint64)
+        b"F"：1tick分の入力．押下キー(uint16，TRACKED_KEYSの順のビット列)，マウスボタン(uint8ビット列)，
+              マウス座標(int16×2)，押されたキーの数(uint8)と，その数だけTRACKED_KEYSの添字(uint8)
+        b"E"：ゲーム終了．step()した回数(uint32)とスコア(int32)（再生結果の照合用）
+    記録は追記するだけなので，途中で落ちてもそれまでの入力は読み出せる
+    """
+    MAGIC = b"KKTN\x01"
+    SEED = struct.Struct("<cQ")
+    FRAME = struct.Struct("<cHBhhB")
+    END = struct.Struct("<cIi")
+
+    def __init__(self, path: str):
+        """
+        引数 path：記録するファイル（既にあれば後ろに追記する）
+        """
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(__class__.MAGIC)
+        self.key_bits = {k: 1 << i for i, k in enumerate(TRACKED_KEYS)}
+        self.key_index = {k: i for i, k in enumerate(TRACKED_KEYS)}
+
+    def start(self, seed: int):
+        """
+        ゲームの開始（シード）を記録する
+        """
+        self.file.write(__class__.SEED.pack(b"S", seed))
+
+    def write(self, frame: InputFrame):
+        """
+        1tick分の入力を記録する
+        """
+        bits = 0
+        for k in frame.pressed:
+            bits |= self.key_bits.get(k, 0)
+        b = frame.buttons
+        keys = bytes(self.key_index[k] for k in frame.keydowns if k in self.key_index)
+        self.file.write(__class__.FRAME.pack(b"F", bits, b[0] | b[1] << 1 | b[2] << 2,
+                                             frame.mouse_pos[0], frame.mouse_pos[1], len(keys)) + keys)
+
+    def finish(self, game: "Game"):
+        """
+        ゲームの終了時の状態を記録する
+        """
+        self.file.write(__class__.END.pack(b"E", game.frames, game.score.value))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def read_recording(path: str) -> list[dict]:
+    """
+    InputRecorderで記録したファイルを読み込む
+    戻り値：ゲームごとの辞書（"seed"，"frames"：InputFrameのリスト，"end"：(step回数, スコア)またはNone）のリスト
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(InputRecorder.MAGIC):
+        raise ValueError(f"{path}は入力の記録ファイルではありません")
+    SEED, FRAME, END = InputRecorder.SEED, InputRecorder.FRAME, InputRecorder.END
+    games = []
+    pos = len(InputRecorder.MAGIC)
+    while pos < len(data):
+        kind = data[pos:pos + 1]
+        if kind == b"S" and pos + SEED.size <= len(data):
+            games.append({"seed": SEED.unpack_from(data, pos)[1], "frames": [], "end": None})
+            pos += SEED.size
+        elif kind == b"F" and games and pos + FRAME.size <= len(data):
+            _, bits, buttons, x, y, n = FRAME.unpack_from(data, pos)
+            pos += FRAME.size
+            if pos + n > len(data):
+                break  # 書き込み途中で終わった記録
+            games[-1]["frames"].append(InputFrame(
+                [k for i, k in enumerate(TRACKED_KEYS) if bits >> i & 1],
+                (bool(buttons & 1), bool(buttons & 2), bool(buttons & 4)),
+                (x, y),
+                [TRACKED_KEYS[i] for i in data[pos:pos + n]]))
+            pos += n
+        elif kind == b"E" and games and pos + END.size <= len(data):
+            games[-1]["end"] = END.unpack_from(data, pos)[1:]
+            pos += END.size
+        else:
+            break  # 壊れた・書き込み途中の記録以降は読まない
+    return games
+
+
+def replay(path: str) -> list[dict]:
+    """
+    記録した入力を画面を使わずに最初から再実行する
+    戻り値：ゲームごとのsimulate()の結果に，記録時の終了状態と一致したか（"match"）を加えた辞書のリスト
+    """
+    results = []
+    for rec in read_recording(path):
+        res = simulate(ScriptedInput(rec["frames"]), rec["seed"], max_frames=len(rec["frames"]))
+        res["match"] = None if rec["end"] is None else rec["end"] == (res["frames"], res["score"])
+        results.append(res)
+    return results
+
+
+def init_headless():
+    """
+    画面を持たない環境でもpygameを使えるように初期化する（SDLのダミードライバ）
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pg.init()
+
+
+def simulate(policy=None, seed: int | None = None, max_frames: int = 50 * 60 * 10,
+             difficulty: Difficulty = DEFAULT_DIFFICULTY) -> dict:
+    """
+    画面を使わずに1ゲームを最後まで（または上限フレームまで）実行する
+    引数1 policy：Gameを受け取ってInputFrameを返す関数（Noneなら何も操作しない）
+    引数2 seed：乱数のシード
+    引数3 max_frames：実行するフレーム数の上限
+    引数4 difficulty：難易度のパラメータ
+    戻り値：結果（"outcome", "frames", "stage1_frames", "score", "stage", "kills"）の辞書
+    """
+    game = Game(seed=seed, difficulty=difficulty)
+    outcome = "timeout"
+    stage1_frames = None  # ステージ1をクリアしたフレーム
+    while game.frames < max_frames:
+        frame = policy(game) if policy is not None else InputFrame()
+        result = game.step(frame)
+        if result == "stage_clear":
+            stage1_frames = game.frames
+        if result in ("quit", "gameover", "game_clear"):
+            outcome = result
+            break
+    return {
+        "seed": seed,
+        "outcome": outcome,
+        "frames": game.frames,
+        "stage1_frames": stage1_frames,
+        "score": game.score.value,
+        "stage": game.stage_manager.stage,
+        "kills": game.stage_manager.enemy_kill_count,
+    }
 
 
 def mouse_setting():
@@ -783,201 +3265,392 @@ def mouse_setting():
     # pg.mouse.set_cursor()
 
 
-def main():
-    while True:
-        pg.display.set_caption("真！こうかとん無双")
-    
-        mouse_setting()  # カーソルの設定（可視不可視など）の関数
+class FixedTimestep:
+    """
+    経過した実時間を貯めて，一定間隔でシミュレーションを進めるためのクラス
+    描画が遅れても1回あたりの進み方は変わらず，ゲームの速さは描画頻度に依存しない
+    """
+    def __init__(self, hz: int = SIM_HZ, max_steps: int = MAX_CATCH_UP):
+        """
+        引数1 hz：1秒あたりのシミュレーション回数
+        引数2 max_steps：1回の描画で進める回数の上限（超えた分の遅れは切り捨てる）
+        """
+        self.dt = 1 / hz
+        self.max_steps = max_steps
+        self.acc = 0.0  # まだシミュレーションしていない時間
+        self.last = None
 
-        screen = pg.display.set_mode((WIDTH, HEIGHT))
-        bg_img = pg.image.load(f"fig/pg_bg.jpg")
-        score = Score()
-        if not wait_for_start(screen):  # ユーザーがゲームを開始しない場合終了
-            return
+    def reset(self):
+        """
+        貯めた時間を捨てる（待ち画面などで止まっていた時間を取り戻さないように）
+        """
+        self.acc = 0.0
+        self.last = None
 
-        bird = Bird(3, (900, 400))
-        bombs = pg.sprite.Group()
-        beams = pg.sprite.Group()
-        exps = pg.sprite.Group()
-        # booms = pg.sprite.Group()
-        emys = pg.sprite.Group()
-        shield = pg.sprite.Group()
-        gra = pg.sprite.Group()
-        emp = EMP(emys, bombs, screen)
-        bosses = pg.sprite.Group()
-        boss_count = 0 # Boss数
-        stage_manager = StageManager(bird, score)
-        tmr = 0
-        clock = pg.time.Clock()
-        mouse_click = False
-        senkai = 0
+    def advance(self, now: float) -> int:
+        """
+        引数 now：現在時刻（秒）
+        戻り値：今回進めるシミュレーションの回数
+        """
+        if self.last is None:
+            self.last = now
+            return 1
+        self.acc += now - self.last
+        self.last = now
+        steps = int(self.acc / self.dt)
+        if steps > self.max_steps:  # 追いつけないほど遅れたら諦めてゆっくり進む
+            steps = self.max_steps
+            self.acc = 0.0
+        else:
+            self.acc -= steps * self.dt
+        return steps
 
-        while True:
-            key_lst = pg.key.get_pressed()
-            mouse_lst = pg.mouse.get_pressed()  # mouseの押下されたボタンのリスト
-            if mouse_lst[0] == True:  # 左クリックがあれば条件式に入る
-                bird.change_img(3, screen)  # こうかとんエフェクト
-                if not mouse_click:
-                    a = Beam(bird)
-                    beams.add(a)
-                    senkai = a.senkai()
-                mouse_click = True
-
-            elif mouse_lst[2] and stage_manager.neobeam_uses > 0:  # 右クリックでNeoBeam発射
-                bird.change_img(3, screen)  # こうかとんエフェクト
-                if not mouse_click:
-                    neo_beam = NeoBeam(bird, 5)  # NeoBeamを生成（5方向）
-                    beams.add(*neo_beam.gen_beams())  # 複数ビームを追加
-                    stage_manager.enemy_kill_for_neobeam == 0  # 使用後に0
-                    stage_manager.neobeam_uses -= 1  # 使用可能回数を減少
-                    if stage_manager.neobeam_uses == 0:
-                        stage_manager.neobeam_ready = False
-                mouse_click = True
+    @property
+    def alpha(self) -> float:
+        """
+        描画時の補間係数（前回と今回のシミュレーション結果の間のどこか）
+        """
+        return min(1.0, self.acc / self.dt)
+
+
+class Scene:
+    """
+    タイトル・操作説明・ゲーム・ゲームオーバーなどの画面（SceneStackに積んで使う）
+    wait_ms()でイベントを待つ時間を決めるので，入力待ちの画面はCPUをほとんど使わない
+    """
+    def enter(self, stack: "SceneStack"):
+        """
+        スタックに積まれたときに呼ばれる
+        """
+
+    def resume(self, stack: "SceneStack"):
+        """
+        上に積まれた画面が取り除かれ，再び一番上になったときに呼ばれる
+        """
+
+    def wait_ms(self) -> int | None:
+        """
+        次のupdate()までにイベントを待つ最長時間（ミリ秒）．Noneならイベントが来るまで待つ，0なら待たない
+        """
+        return None
+
+    def update(self, stack: "SceneStack", events: list[pg.event.Event]):
+        """
+        届いたイベントを処理し，画面を更新する
+        """
+
+
+class SceneStack:
+    """
+    画面をスタックで管理し，一番上の画面だけを動かすクラス
+    イベントはpg.event.waitで待つので，画面ごとのビジーループやtime.sleepが要らない
+    """
+    def __init__(self, screen: pg.Surface):
+        self.screen = screen
+        self.scenes: list[Scene] = []
+        self.result = None  # run()の戻り値
+
+    def push(self, scene: Scene):
+        self.scenes.append(scene)
+        scene.enter(self)
+
+    def pop(self, count: int = 1):
+        del self.scenes[len(self.scenes) - count:]
+        if self.scenes:
+            self.scenes[-1].resume(self)
+
+    def quit(self, result=None):
+        self.scenes.clear()
+        self.result = result
+
+    def run(self):
+        """
+        スタックが空になるまで一番上の画面を動かす
+        戻り値：quit()に渡した値
+        """
+        while self.scenes:
+            scene = self.scenes[-1]
+            timeout = scene.wait_ms()
+            if timeout is None:
+                events = [pg.event.wait()]
+            elif timeout > 0:
+                events = [pg.event.wait(timeout)]
             else:
-                mouse_click = False
-
-            for event in pg.event.get():  # イベントリストを取得
-                if event.type == pg.QUIT:
-                    return 0
-                
-                if score.value >= 50 and (event.type == pg.KEYDOWN and event.key == pg.K_l):
-                    shield.add(Shield(bird, life=400))
-                    score.value -= 50  # スコア消費
-                if score.value >= 100 and (event.type == pg.KEYDOWN and event.key == pg.K_RETURN):  # score100以上で
-                    score.value -= 100  # scoreのうち100を消費
-                    gra.add(Gravity())
-                if event.type == pg.KEYDOWN and event.key == pg.K_RSHIFT and score.value > 100:
-                    bird.state = "hyper"
-                    bird.hyper_life = 50
-                    score.value -= 50  # スコア消費
-                if score.value >= 20 and key_lst[pg.K_e] and not emp.active:
-                    if score.value >= 20:
-                        score.value -= 20
-                    emp.activate()
-                elif emp.active and key_lst[pg.K_e]:
-                    emp.deactivate()
+                events = []
+            events = [e for e in events if e.type != pg.NOEVENT] + pg.event.get()
+            if any(e.type == pg.QUIT for e in events):
+                self.quit(0)
+                break
+            scene.update(self, events)
+        return self.result
 
-            screen.blit(bg_img, [0, 0])
 
-            if stage_manager.stage == 1 and tmr % 200 == 0:
-                emys.add(Enemy())
-
-            for emy in emys:
-                if emy.state == "stop" and tmr%emy.interval == 0:
-                    # 敵機が停止状態に入ったら，intervalに応じて爆弾投下
-                    if score.value < 50 or boss_count == 1:
-                        bombs.add(Bomb(emy, bird, 6))
-                    elif score.value < 100:
-                        bomb_pro = BombProjectile(emy, bird, 3, 8)
-                        bombs.add(*bomb_pro.gen_bombs())
-                    else:
-                        bomb_pro = BombProjectile(emy, bird, 5, 10)
-                        bombs.add(*bomb_pro.gen_bombs())
-                        
-            # ボスの生成: ステージ 2
-            if stage_manager.stage == 2:
-                if boss_count == 0:
-                    bosses.add(Boss(health=30))
-                    boss_count = 1  # Bossが生成されたことを記録
-
-                if tmr % 150 == 0 and len(emys) < 3:  # 敵を定期的に生成し、敵の数を3体まで制限する
-                    emys.add(Enemy())
-                    for emy in emys:
-                        if emy.state == "stop" and tmr % emy.interval == 0:
-                            bombs.add(Bomb(emy, bird, 6))
-
-            for emy in pg.sprite.groupcollide(emys, beams, True, True).keys():  # ビームと衝突した敵機リスト
-                exps.add(Explosion(emy, 100))  # 爆発エフェクト
-                score.value += 10  # 10点アップ
-                bird.change_img(9, screen)  # こうかとん歌うエフェクト
-                stage_manager.enemy_kill_count += 1
-                stage_manager.enemy_kill_for_neobeam += 1  # NeoBeam用のカウントを増やす
-                if stage_manager.enemy_kill_for_neobeam >= 3:
-                    stage_manager.reset_neobeam_uses()
-
-            for bomb in pg.sprite.groupcollide(bombs, beams, True, True).keys():  # ビームと衝突した爆弾リスト
-                if bomb.state == "active":
-                    exps.add(Explosion(bomb, 50))  # 爆発エフェクト
-                    bird.change_img(6, screen)  # こうかとん喜びエフェクト
-                    score.value += 1  # 1点アップ
+class TitleScene(Scene):
+    """
+    タイトル画面（Sキーでゲーム開始，Iキーで操作説明，Xキーで終了）
+    """
+    def __init__(self, new_game_scene):
+        """
+        引数 new_game_scene：ゲーム画面のSceneを作って返す関数
+        """
+        self.new_game_scene = new_game_scene
+
+    def enter(self, stack: SceneStack):
+        self.start_screen = StartScreen(stack.screen)
+        self.resume(stack)
+
+    def resume(self, stack: SceneStack):
+        stack.screen.fill((0, 0, 0))
+        self.start_screen.display()  # タイトル画面を表示
+
+    def update(self, stack: SceneStack, events: list[pg.event.Event]):
+        for event in events:
+            if event.type != pg.KEYDOWN:
+                continue
+            if event.key == pg.K_s:  # Sキーでゲーム開始
+                stack.push(self.new_game_scene())
+                return
+            if event.key == pg.K_i:  # Iキーで操作説明画面に切り替え
+                stack.push(InstructionsScene())
+                return
+            if event.key == pg.K_x:  # Xキーでゲーム終了
+                stack.quit()
+                return
+
+
+class InstructionsScene(Scene):
+    """
+    操作説明画面（Bキーで戻る）
+    """
+    LINES = [
+        "操作説明:",
+        "WASDキー: こうかとんを移動",
+        "左Shiftキー: 高速化",
+        "左クリック: ビーム発射",
+        "右クリック: 弾幕",
+        "リターンキー: 重力場 (100スコア消費)",
+        "RShift: 無敵モード (50スコア消費)",
+        "[l]キー: 防御壁 (50スコア消費)",
+        "[e]キー: 敵機と爆弾の無効化 (20スコア消費)",
+    ]
+
+    def enter(self, stack: SceneStack):
+        screen = stack.screen
+        font = FONTS.get(50) # 日本語フォントを指定
+        screen.fill((0, 0, 0)) # 背景を黒に塗りつぶす
+        for i, line in enumerate(__class__.LINES):
+            text = font.render(line, True, (255, 255, 255)) # 白色でテキストを描画
+            screen.blit(text, (50, 50 + i * 60)) # テキストを表示
+        back_text = font.render("Bキーを押して戻る", True, (255, 0, 0))  # 赤色で描画
+        screen.blit(back_text, (50, 50 + len(__class__.LINES) * 60))  # 操作説明の下に表示
+        pg.display.update()  # 画面更新
+
+    def update(self, stack: SceneStack, events: list[pg.event.Event]):
+        if any(e.type == pg.KEYDOWN and e.key == pg.K_b for e in events):
+            stack.pop()  # Bキーでタイトル画面に戻る
 
-            for bomb in pg.sprite.groupcollide(bombs, shield, True, True).keys():  # 防御壁と衝突した爆弾リスト
-                if bomb.state == "active":
-                    exps.add(Explosion(bomb, 50))  # 爆発エフェクト
-
-            for bomb in pg.sprite.spritecollide(bird, bombs, True):  # こうかとんと衝突した爆弾リスト
-                if bomb.state == "active":
-                    if bird.state == "hyper":  # state="hyper"なら
-                        exps.add(Explosion(bomb, 50))  # 爆発エフェクト
-                        score.value += 1  # 1点アップ
-                    else:  # state="hyper"ではないなら
-                        stage_manager.gameover(screen)
-
-                        # 初期化処理を追加
-                        score = Score()  # スコアをリセット
-                        stage_manager = StageManager(bird, score)  # ステージ情報をリセット
-                        tmr = 0  # タイマーをリセット
-                        emys.empty()  # 敵キャラクターを全て削除
-                        bombs.empty()  # 爆弾を全て削除
-                        bosses.empty()  #　ボスを削除
-                        exps.empty()
-                        boss_count = 0
-                        wait_for_start(screen) # タイトル画面に戻る
-                        break # ゲームループから抜ける
-                        
-            for emy in pg.sprite.groupcollide(emys, gra, True, False).keys():  # 重力と衝突した敵機リスト
-                exps.add(Explosion(emy, 100))  # 敵機の爆発エフェクト
-            
-            for bomb in pg.sprite.groupcollide(bombs, gra, True, False).keys():  # 重力と衝突した爆弾リスト
-                exps.add(Explosion(bomb, 50))  # 爆弾の爆発エフェクト
-
-            # Bossとビームの衝突判定
-            for boss in pg.sprite.groupcollide(bosses, beams, False, True).keys():
-                boss.health -= 1
-                if boss.health <= 0:
-                    exps.add(Explosion(boss, 200))
-
-            # ステージクリア処理
-            if stage_manager.check_stage_clear(screen, emys):
-                continue # ステージ遷移
-            # ゲームクリア処理
-            for boss in bosses:
-                b_health = boss.health
-                if stage_manager.check_game_clear(screen, b_health):
-                    time.sleep(2)
-                    return
-            # ゲームオーバー処理
-            for bomb in pg.sprite.spritecollide(bird, bombs, True):
-                if bird.state != "hyper":
-                    stage_manager.gameover(screen)
-                    break # タイトル画面に戻る
-
-            bird.update(key_lst, mouse_click, senkai, screen)
-            beams.update(bird, screen)
-            beams.draw(screen)
-            emys.update()
-            emys.draw(screen)
-            bombs.update()
-            bombs.draw(screen)
-            exps.update()
-            exps.draw(screen)
-            # booms.update()
-            # booms.draw(screen)
-            gra.update(screen)
-            score.update(screen)
-            bosses.update(bombs, bird)
-            bosses.draw(screen)
-            shield.update()
-            shield.draw(screen)
-            stage_manager.display_stage(screen)  # ステージ番号を右下に表示
-            stage_manager.display_neobeam_status(screen)  # NeoBeamの状態を表示
+
+class BannerScene(Scene):
+    """
+    今の画面の上にメッセージをフェードインで重ねる画面（ステージクリア，ゲームクリア，ゲームオーバー）
+    フェード中だけ一定間隔で描き直し，あとは時間切れかキー入力までイベントを待つ
+    """
+    FRAME_MS = 1000 // 30  # フェード中の描き直しの間隔
+
+    def __init__(self, draw, duration_ms: int | None = None, keys: tuple[int, ...] = (),
+                 on_done=None, fade_ms: int = 400):
+        """
+        引数1 draw：Surfaceを受け取ってメッセージを描く関数
+        引数2 duration_ms：表示する時間（Noneならkeysのどれかが押されるまで）
+        引数3 keys：表示を終えるキー
+        引数4 on_done：表示を終えるときにSceneStackを渡して呼ぶ関数（Noneならこの画面を取り除く）
+        引数5 fade_ms：フェードインの時間
+        """
+        self.draw = draw
+        self.duration_ms = duration_ms
+        self.keys = keys
+        self.on_done = on_done
+        self.fade_ms = fade_ms
+
+    def enter(self, stack: SceneStack):
+        self.start = pg.time.get_ticks()
+        self.background = stack.screen.copy()
+        self.final = self.background.copy()
+        self.draw(self.final)
+        self.alpha = None
+
+    def elapsed(self) -> int:
+        return pg.time.get_ticks() - self.start
+
+    def wait_ms(self) -> int | None:
+        elapsed = self.elapsed()
+        if elapsed < self.fade_ms:
+            return __class__.FRAME_MS
+        if self.duration_ms is None:
+            return None
+        return max(0, self.duration_ms - elapsed)
+
+    def update(self, stack: SceneStack, events: list[pg.event.Event]):
+        elapsed = self.elapsed()
+        if (self.duration_ms is not None and elapsed >= self.duration_ms or
+                any(e.type == pg.KEYDOWN and e.key in self.keys for e in events)):
+            if self.on_done is None:
+                stack.pop()
+            else:
+                self.on_done(stack)
+            return
+        alpha = min(255, 255 * elapsed // max(1, self.fade_ms))
+        if alpha != self.alpha:  # フェードが進んだときだけ描き直す
+            self.alpha = alpha
+            screen = stack.screen
+            screen.blit(self.background, (0, 0))
+            self.final.set_alpha(alpha)
+            screen.blit(self.final, (0, 0))
+            pg.display.update()
+
+
+class GameScene(Scene):
+    """
+    ゲーム画面（シミュレーションはSIM_HZで進め，描画はfpsを上限に毎フレーム行う）
+    """
+    def __init__(self, fps: int, recorder: "InputRecorder | None"):
+        """
+        引数1 fps：描画の上限フレームレート（0なら上限なし）
+        引数2 recorder：入力を記録するInputRecorder（Noneなら記録しない）
+        """
+        self.fps = fps
+        self.recorder = recorder
+        self.profiler = FrameProfiler(budget_ms=1000 / (fps or SIM_HZ))  # F3で表示切替，F4でトレースを書き出す
+        self.renderer = DirtyRenderer()  # 変化した範囲だけを描き直す
+        self.timestep = FixedTimestep()
+        self.clock = pg.time.Clock()
+        self.keydowns = []  # まだシミュレーションに渡していない押下キー
+
+    def enter(self, stack: SceneStack):
+        self.game = new_game(stack.screen, self.profiler, self.recorder)
+        self.resume(stack)
+
+    def resume(self, stack: SceneStack):
+        self.renderer.invalidate()
+        self.timestep.reset()
+        self.keydowns = []
+
+    def wait_ms(self) -> int:
+        return 0  # 毎フレーム動く（待ち時間はclock.tickで取る）
+
+    def update(self, stack: SceneStack, events: list[pg.event.Event]):
+        game, profiler, renderer, recorder = self.game, self.profiler, self.renderer, self.recorder
+        screen = stack.screen
+        profiler.begin_frame()
+        for event in events:
+            if event.type == pg.KEYDOWN and event.key == pg.K_F3:
+                profiler.toggle()
+                renderer.invalidate()
+            if event.type == pg.KEYDOWN and event.key == pg.K_F4:
+                profiler.export_trace("profile_trace.json")
+        frame = InputFrame.from_pygame(events)
+        self.keydowns += frame.keydowns
+
+        result = None
+        for _ in range(self.timestep.advance(time.perf_counter())):
+            # 押されたキーは最初の1回にだけ渡す
+            tick = InputFrame(frame.pressed, frame.buttons, frame.mouse_pos, self.keydowns)
+            if recorder is not None:
+                recorder.write(tick)
+            result = game.step(tick)
+            self.keydowns = []
+            if result is not None:
+                break
+        if recorder is not None and result in ("gameover", "game_clear"):
+            recorder.finish(game)
+        if result == "gameover":  # Bキーでタイトル画面に戻る
+            stack.push(BannerScene(game.stage_manager.display_gameover, keys=(pg.K_b,),
+                                   on_done=lambda st: st.pop(2)))
+            return
+        if result == "game_clear":  # ゲームクリア後に静止してから終了
+            stack.push(BannerScene(game.stage_manager.display_game_clear, 3000, on_done=lambda st: st.quit()))
+            return
+        if result == "stage_clear":  # ステージ遷移
+            cleared = game.stage_manager.stage - 1
+            stack.push(BannerScene(lambda scr: game.stage_manager.display_stage_clear(scr, cleared), 2000))
+            return
+
+        dirty = renderer.render(game, screen, self.timestep.alpha)
+        if profiler.enabled:  # グラフの下も毎フレーム描き直す
+            profiler.draw(screen)
+            renderer.invalidate()
+        profiler.mark("display.update")
+        if dirty is None:
             pg.display.update()
-            tmr += 1
-            clock.tick(50)
+        else:
+            pg.display.update(dirty)
+        profiler.end_frame()
+        self.clock.tick(self.fps)
+
+
+def new_game(screen: pg.Surface, profiler: FrameProfiler, recorder: InputRecorder | None) -> "Game":
+    """
+    シードを決めてゲームを作り，記録中ならシードを記録する
+    """
+    seed = int.from_bytes(os.urandom(4), "little")
+    if recorder is not None:
+        recorder.start(seed)
+    return Game(screen, seed=seed, profiler=profiler, interpolate=True)
+
+
+def main(fps: int = 60, record: str | None = None):
+    """
+    引数1 fps：描画の上限フレームレート（0なら上限なし）．シミュレーションは常にSIM_HZで進む
+    引数2 record：入力を記録するファイル（Noneなら記録しない）
+    """
+    pg.display.set_caption("真！こうかとん無双")
+
+    mouse_setting()  # カーソルの設定（可視不可視など）の関数
+
+    screen = pg.display.set_mode((WIDTH, HEIGHT))
+    StartScreen(screen).preload()  # 画像をまとめて読み込む
+
+    recorder = InputRecorder(record) if record else None
+    stack = SceneStack(screen)
+    stack.push(TitleScene(lambda: GameScene(fps, recorder)))
+    try:
+        return stack.run()
+    finally:
+        if recorder is not None:
+            recorder.close()
 
 
 if __name__ == "__main__":
-    pg.init()
-    main()
+    parser = argparse.ArgumentParser(description="真！こうかとん無双")
+    parser.add_argument("--headless", type=int, metavar="GAMES", help="画面を使わずにGAMES回シミュレーションする")
+    parser.add_argument("--seed", type=int, default=0, help="ヘッドレス実行の最初のシード")
+    parser.add_argument("--fps", type=int, default=60, help="描画の上限フレームレート（0なら上限なし）")
+    parser.add_argument("--font", metavar="PATH", help="日本語フォントのファイル（省略時は自動で探す）")
+    parser.add_argument("--record", metavar="PATH", help="プレイ中の入力をPATHに記録する")
+    parser.add_argument("--replay", metavar="PATH", help="記録した入力を画面を使わずに再実行する")
+    parser.add_argument("--stages", metavar="PATH", default=STAGES_FILE,
+                        help="ステージ定義ファイル（背景のスクロールの例はstages_scroll.json）")
+    args = parser.parse_args()
+    STAGES_FILE = args.stages
+    FONTS.configure(args.font)
+    if args.replay:
+        init_headless()
+        start = time.perf_counter()
+        results = replay(args.replay)
+        for res in results:
+            print(res)
+        elapsed = time.perf_counter() - start
+        frames = sum(res["frames"] for res in results)
+        print(f"{len(results)} games, {frames} frames: {elapsed:.2f}s "
+              f"(x{frames / SIM_HZ / max(elapsed, 1e-9):.0f} realtime)")
+    elif args.headless:
+        init_headless()
+        start = time.perf_counter()
+        for i in range(args.headless):
+            print(simulate(seed=args.seed + i))
+        print(f"{args.headless} games: {time.perf_counter() - start:.2f}s")
+    else:
+        pg.init()
+        main(args.fps, args.record)
     pg.quit()
     sys.exit()
@@ -0,0 +1,172 @@
+"""
+真！こうかとん無双の難易度調整スイープ
+難易度パラメータ（Difficulty）の組み合わせごとに，スクリプトで操作するプレイヤーに
+画面なしで何度もゲームをさせ，生存時間・スコア・クリアまでのフレーム数をCSVに集計する
+ゲームは全コアのプロセスプールで並列に実行する
+
+使い方：
+    python sweep.py --grid boss_health=20,30,40 --grid clear_kills=10,15 --games 200 --out sweep.csv
+    python sweep.py --grid small_volley=3:8,4:10 --policy dodger --raw games.csv
+"""
+import argparse
+import csv
+import itertools
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pygame as pg
+
+import musou_kokaton as mk
+
+
+def idle_policy(game: mk.Game) -> mk.InputFrame:
+    """
+    何も操作しないプレイヤー
+    """
+    return mk.InputFrame()
+
+
+def sniper_policy(game: mk.Game) -> mk.InputFrame:
+    """
+    動かずに，4フレームごとに敵機（いなければボス）を順に狙ってビームを撃つプレイヤー
+    """
+    targets = game.emys.sprites() or game.bosses.sprites()
+    if not targets or game.frames % 4:
+        return mk.InputFrame()
+    target = targets[game.frames // 4 % len(targets)]
+    return mk.InputFrame(buttons=(True, False, False), mouse_pos=target.rect.center)
+
+
+def dodger_policy(game: mk.Game) -> mk.InputFrame:
+    """
+    近くの爆弾から左右に逃げながら敵機を狙い，NeoBeamと重力場も使うプレイヤー
+    """
+    bird = game.bird.rect
+    pressed = []
+    near = [b for b in game.bombs if abs(b.rect.centerx - bird.centerx) < 120 and b.rect.centery < bird.centery + 60]
+    if near:
+        pressed.append(pg.K_a if near[0].rect.centerx > bird.centerx else pg.K_d)
+    keydowns = [pg.K_RETURN] if game.score.value >= 100 else []
+    targets = game.emys.sprites() + game.bosses.sprites()
+    if not targets:
+        return mk.InputFrame(pressed, keydowns=keydowns)
+    target = targets[game.frames % len(targets)].rect.center
+    if game.frames % 4 == 0:
+        return mk.InputFrame(pressed, (True, False, False), target, keydowns)
+    if game.frames % 7 == 0:
+        return mk.InputFrame(pressed, (False, False, True), target, keydowns)
+    return mk.InputFrame(pressed, mouse_pos=target, keydowns=keydowns)
+
+
+POLICIES = {"idle": idle_policy, "sniper": sniper_policy, "dodger": dodger_policy}
+
+
+def parse_grid(specs: list[str]) -> dict[str, list]:
+    """
+    "名前=値1,値2,..."のリストを{名前: 値のリスト}にする（"3:8"のような値は整数のタプル）
+    """
+    names = mk.DEFAULT_DIFFICULTY.as_dict()
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if name not in names or not values:
+            raise SystemExit(f"--grid {spec}：名前は{', '.join(names)}のいずれか，値は=の後に,区切りで指定")
+        grid[name] = [tuple(int(v) for v in value.split(":")) if ":" in value else int(value)
+                      for value in values.split(",")]
+    return grid
+
+
+def init_worker():
+    mk.init_headless()
+
+
+def run_game(task: tuple) -> dict:
+    """
+    プロセスプールで1ゲームを実行する
+    引数 task：(組み合わせの番号, パラメータの辞書, シード, プレイヤー名, 上限フレーム数)
+    """
+    cell, params, seed, policy, max_frames = task
+    res = mk.simulate(POLICIES[policy], seed, max_frames, mk.Difficulty(**params))
+    res["cell"] = cell
+    return res
+
+
+def mean(values: list) -> float | None:
+    return round(statistics.fmean(values), 2) if values else None
+
+
+def summarize(params: dict, games: list[dict]) -> dict:
+    """
+    1つの組み合わせの結果をまとめる
+    """
+    clears = [g["frames"] for g in games if g["outcome"] == "game_clear"]
+    stage1 = [g["stage1_frames"] for g in games if g["stage1_frames"] is not None]
+    row = {name: ":".join(map(str, v)) if isinstance(v, tuple) else v for name, v in params.items()}
+    row.update({
+        "games": len(games),
+        "clear_rate": round(len(clears) / len(games), 4),
+        "gameover_rate": round(sum(g["outcome"] == "gameover" for g in games) / len(games), 4),
+        "survival_mean": mean([g["frames"] for g in games]),
+        "survival_p50": statistics.median(g["frames"] for g in games),
+        "score_mean": mean([g["score"] for g in games]),
+        "kills_mean": mean([g["kills"] for g in games]),
+        "stage1_frames_mean": mean(stage1),
+        "clear_frames_mean": mean(clears),
+        "clear_frames_p50": statistics.median(clears) if clears else None,
+    })
+    return row
+
+
+def write_csv(path: str, rows: list[dict]):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="難易度パラメータのスイープ")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2",
+                        help="振るパラメータと値（複数指定可，指定しないものは既定値）")
+    parser.add_argument("--games", type=int, default=100, help="組み合わせごとのゲーム数（シード数）")
+    parser.add_argument("--seed", type=int, default=0, help="最初のシード")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="dodger", help="操作するプレイヤー")
+    parser.add_argument("--max-frames", type=int, default=50 * 60 * 5, help="1ゲームの上限フレーム数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="プロセス数")
+    parser.add_argument("--out", default="sweep.csv", help="組み合わせごとの集計を書き出すCSV")
+    parser.add_argument("--raw", help="1ゲームごとの結果を書き出すCSV")
+    args = parser.parse_args()
+
+    grid = parse_grid(args.grid)
+    base = mk.DEFAULT_DIFFICULTY.as_dict()
+    cells = [dict(base, **dict(zip(grid, values))) for values in itertools.product(*grid.values())]
+    tasks = [(i, params, args.seed + s, args.policy, args.max_frames)
+             for i, params in enumerate(cells) for s in range(args.games)]
+    print(f"{len(cells)} combinations × {args.games} games = {len(tasks)} games on {args.workers} workers")
+
+    start = time.perf_counter()
+    results: list[list[dict]] = [[] for _ in cells]
+    with ProcessPoolExecutor(args.workers, initializer=init_worker) as pool:
+        chunksize = max(1, len(tasks) // (args.workers * 8))
+        for done, res in enumerate(pool.map(run_game, tasks, chunksize=chunksize), 1):
+            results[res["cell"]].append(res)
+            if done % 1000 == 0:
+                print(f"  {done}/{len(tasks)} games, {time.perf_counter() - start:.1f}s")
+    elapsed = time.perf_counter() - start
+    print(f"{len(tasks)} games: {elapsed:.1f}s ({len(tasks) / elapsed:.0f} games/s)")
+
+    rows = [summarize(params, games) for params, games in zip(cells, results)]
+    write_csv(args.out, rows)
+    for row in rows:
+        print({name: row[name] for name in grid}, f"clear={row['clear_rate']:.2f}",
+              f"survival={row['survival_mean']}", f"score={row['score_mean']}")
+    if args.raw:
+        write_csv(args.raw, [dict(res) for games in results for res in games])
+
+
+if __name__ == "__main__":
+    main()
+    sys.exit()